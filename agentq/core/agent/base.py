@@ -1,3 +1,4 @@
+import asyncio
 import json
 import os
 from typing import Callable, List, Optional, Tuple, Type
@@ -140,26 +141,33 @@ class BaseAgent:
 
         # logger.info(self.messages)
 
+        # Without history every run starts its own list above, keep a reference so that concurrent runs
+        # (e.g. the critic calls of _rank_actions) never send each other's messages
+        messages = self.messages
+
         # TODO: add a max_turn here to prevent a inifinite fallout
         while True:
             # TODO:
             # 1. exeception handling while calling the client
             # 2. remove the else block as JSON mode in instrutor won't allow us to pass in tools.
+            # The client is synchronous, run it in a worker thread so the event loop (and other runs) keep going
             if len(self.tools_list) == 0:
-                response = self.client.chat.completions.create(
+                response = await asyncio.to_thread(
+                    self.client.chat.completions.create,
                     model=model,
                     # model="gpt-4o-2024-08-06",
                     # model="gpt-4o-mini",
                     # model="groq/llama3-groq-70b-8192-tool-use-preview",
                     # model="xlam-1b-fc-r",
-                    messages=self.messages,
+                    messages=messages,
                     response_model=self.output_format,
                     max_retries=4,
                 )
             else:
-                response = self.client.chat.completions.create(
+                response = await asyncio.to_thread(
+                    self.client.chat.completions.create,
                     model=model,
-                    messages=self.messages,
+                    messages=messages,
                     response_model=self.output_format,
                     tool_choice="auto",
                     tools=self.tools_list,
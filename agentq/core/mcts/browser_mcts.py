@@ -1,11 +1,21 @@
 import asyncio
+import hashlib
 import json
 import sys
-from typing import List, Tuple
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import re
 import numpy as np
 from langsmith import traceable
-from playwright.async_api import Page
+from playwright.async_api import Locator, Page
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+try:
+    import orjson
+except ImportError:  # optional, json is used when it is missing
+    orjson = None
 
 from agentq.core.agent.agentq_actor import AgentQActor
 from agentq.core.agent.agentq_critic import AgentQCritic
@@ -36,6 +46,7 @@ from agentq.core.skills.get_screenshot import get_screenshot
 from agentq.core.skills.get_url import geturl
 from agentq.core.skills.open_url import openurl
 from agentq.core.web_driver.playwright import PlaywrightManager
+from agentq.utils.logger import logger
 
 # ANSI color codes
 BLUE = "\033[94m"
@@ -79,6 +90,243 @@ SPECIAL_KEY_MAPPINGS = {
     "f12": "F12",
 }
 
+_playwright_manager: Optional[PlaywrightManager] = None
+
+
+def _get_manager() -> PlaywrightManager:
+    # PlaywrightManager is a singleton, keep the one instance instead of going through its constructor on every call
+    global _playwright_manager
+    if _playwright_manager is None:
+        _playwright_manager = PlaywrightManager()
+    return _playwright_manager
+
+
+# Terminality verdicts of already judged pages: (variant, objective, digest of screenshot + completed tasks) -> terminal
+_TERMINAL_CACHE_SIZE = 512
+_TERMINAL_CACHE: "OrderedDict[Tuple[str, str, bytes], bool]" = OrderedDict()
+
+
+def _terminal_cache_key(variant: str, state: BrowserState, screenshot) -> Tuple[str, str, bytes]:
+    # get_screenshot returns (base64 image, file path), only the image identifies the page
+    image = screenshot[0] if isinstance(screenshot, tuple) else screenshot
+    digest = hashlib.sha256(str(image).encode("utf-8"))
+    # the critic also sees the completed tasks, the same page after other tasks can be judged differently
+    for task in state.completed_tasks or ():
+        digest.update(task.model_dump_json().encode("utf-8"))
+    return variant, state.objective, digest.digest()
+
+
+def _get_cached_terminal(key: Tuple[str, str, bytes]):
+    terminal = _TERMINAL_CACHE.get(key)
+    if terminal is not None:
+        _TERMINAL_CACHE.move_to_end(key)
+    return terminal
+
+
+def _cache_terminal(key: Tuple[str, str, bytes], terminal: bool):
+    _TERMINAL_CACHE[key] = terminal
+    if len(_TERMINAL_CACHE) > _TERMINAL_CACHE_SIZE:
+        _TERMINAL_CACHE.popitem(last=False)
+
+
+def clear_terminal_cache():
+    _TERMINAL_CACHE.clear()
+
+
+# Locators of the mmid selectors used on each page. A locator is resolved again on every use, so it stays valid
+# when the DOM changes, and the same mmid is acted on again and again across MCTS rollouts.
+_locator_cache: "weakref.WeakKeyDictionary[Page, Dict[str, Locator]]" = weakref.WeakKeyDictionary()
+
+
+def _locator(page: Page, selector: str) -> Locator:
+    locators = _locator_cache.setdefault(page, {})
+    locator = locators.get(selector)
+    if locator is None:
+        # .first keeps the non-strict behaviour of the page.*(selector) calls this replaces
+        locator = locators[selector] = page.locator(selector).first
+    return locator
+
+
+# Action handlers: each one takes (action, page, browser_manager) and returns the coroutine function that performs
+# the action, which execute_browser_action retries, and the message logged once it succeeded.
+# Anything that can't work on a retry either (e.g. an invalid key combination) is raised by the handler itself.
+ActionRunner = Tuple[Callable[[], Awaitable[None]], str]
+
+
+def _goto_url_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    async def goto_url_action():
+        await openurl(url=action.website, timeout=action.timeout or 1)
+
+    return goto_url_action, "Went to url"
+
+
+def _type_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    selector = f"[mmid='{action.mmid}']"
+    entry = EnterTextEntry(
+        query_selector=selector,
+        text=action.content,
+    )
+
+    async def type_action():
+        await _locator(page, selector).wait_for(state='visible', timeout=60000)
+        await entertext(entry)
+
+    return type_action, "Typed text into element"
+
+
+def _click_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    selector = f"[mmid='{action.mmid}']"
+
+    async def click_action():
+        await _locator(page, selector).wait_for(state='visible', timeout=60000)
+        if not action.wait_before_execution:
+            # Instead of a fixed 2 second pause, wait at most that long for the page to finish loading
+            try:
+                await page.wait_for_function("document.readyState === 'complete'", timeout=2000)
+            except Exception:
+                pass
+        await click(
+            selector=selector,
+            wait_before_execution=action.wait_before_execution or 0,
+        )
+
+    return click_action, "Clicked element"
+
+
+def _enter_text_and_click_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    text_selector = f"[mmid='{action.text_element_mmid}']"
+
+    async def enter_text_and_click_action():
+        result = await enter_text_and_click(
+            text_selector=text_selector,
+            text_to_enter=action.text_to_enter,
+            click_selector=f"[mmid='{action.click_element_mmid}']",
+            wait_before_click_execution=2,
+        )
+        if not result:
+            raise Exception(f"Failed to enter text '{action.text_to_enter}' into element with selector '{text_selector}'. Check that the selector is valid.")
+
+    return enter_text_and_click_action, "Entered text and clicked element"
+
+
+def _hover_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    selector = f"[mmid='{action.mmid}']"
+
+    async def hover_action():
+        await _locator(page, selector).wait_for(state='visible', timeout=60000)
+        await _locator(page, selector).hover()
+
+    return hover_action, "Hovered over element"
+
+
+def _scroll_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    direction = "up" if "up" in action.direction else "down"
+    sign = "-" if direction == "up" else "+"
+    script = f"(document.scrollingElement || document.body).scrollTop = (document.scrollingElement || document.body).scrollTop {sign} window.innerHeight;"
+
+    async def scroll_action():
+        await page.evaluate(script)
+
+    return scroll_action, f"Scrolled {direction}"
+
+
+def _key_press_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    keys = action.action_str
+    match = re.search(r"press ?\[(.+)\]", keys)
+    if not match:
+        raise ValueError(f"Invalid press action {keys}")
+    key_comb = match.group(1)
+    mapped_keys = "+".join(
+        SPECIAL_KEY_MAPPINGS.get(key.lower(), key) for key in key_comb.split("+")
+    )
+
+    async def key_press_action():
+        await page.keyboard.press(mapped_keys)
+
+    return key_press_action, f"Pressed keys: {mapped_keys}"
+
+
+def _new_tab_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    async def new_tab_action():
+        browser_ctx = await browser_manager.get_browser_context()
+        page = await browser_ctx.new_page()
+        await page.goto("https://www.google.com")
+
+    return new_tab_action, "Opened new tab"
+
+
+def _go_back_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    async def go_back_action():
+        await page.go_back()
+
+    return go_back_action, "Navigated back"
+
+
+def _go_forward_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    async def go_forward_action():
+        await page.go_forward()
+
+    return go_forward_action, "Navigated forward"
+
+
+def _page_close_handler(action, page: Page, browser_manager: PlaywrightManager) -> ActionRunner:
+    async def page_close_action():
+        await page.close()
+        pages = await page.context.pages()
+        if len(pages) == 0:
+            new_page = await page.context.new_page()
+            await new_page.goto("https://www.google.com")
+
+    return page_close_action, "Closed page"
+
+
+ACTION_HANDLERS: Dict[ActionType, Callable[..., ActionRunner]] = {
+    ActionType.GOTO_URL: _goto_url_handler,
+    ActionType.TYPE: _type_handler,
+    ActionType.CLICK: _click_handler,
+    ActionType.ENTER_TEXT_AND_CLICK: _enter_text_and_click_handler,
+    ActionType.HOVER: _hover_handler,
+    ActionType.SCROLL: _scroll_handler,
+    ActionType.KEY_PRESS: _key_press_handler,
+    ActionType.NEW_TAB: _new_tab_handler,
+    ActionType.GO_BACK: _go_back_handler,
+    ActionType.GO_FORWARD: _go_forward_handler,
+    ActionType.PAGE_CLOSE: _page_close_handler,
+}
+
+
+# Screenshot of the current page started right after a step, so it is ready by the time the terminal check needs it.
+# Dropped whenever an action changes the page.
+_screenshot_prefetch: Optional[asyncio.Task] = None
+
+
+# The terminal check only needs to judge the page, a JPEG is several times smaller to encode and upload than a PNG
+_TERMINAL_SCREENSHOT_OPTIONS = {"image_format": "jpeg", "quality": 75}
+
+
+def _prefetch_screenshot():
+    global _screenshot_prefetch
+    _screenshot_prefetch = asyncio.create_task(get_screenshot(**_TERMINAL_SCREENSHOT_OPTIONS))
+    # the result may never be awaited if the page changes first, don't let its error go unretrieved
+    _screenshot_prefetch.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+def _drop_screenshot_prefetch():
+    global _screenshot_prefetch
+    _screenshot_prefetch = None
+
+
+async def _get_screenshot():
+    task = _screenshot_prefetch
+    if task is not None:
+        try:
+            # shielded, the same prefetch can be shared by several checks of one state
+            return await asyncio.shield(task)
+        except Exception as e:
+            logger.warning("Prefetched screenshot failed: %s. Taking a new one", e)
+    return await get_screenshot(**_TERMINAL_SCREENSHOT_OPTIONS)
+
+
 @traceable(run_type="chain", name="mcts")
 class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
     def __init__(self, objective: str, vision: BaseAgent, critic: BaseAgent) -> None:
@@ -86,16 +334,40 @@ class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
         self.objective = objective
         self.vision = vision
         self.critic = critic
-        print(
-            f"{BLUE}[DEBUG] BrowserWorldModel initialized with objective: {self.objective}{RESET}"
-        )
+        self._pw = _get_manager()
+        # The current page, looked up again only once it is closed or a new page (tab) opens
+        self._page: Optional[Page] = None
+        self._watched_context = None
+        # Set when the current page navigated since the last DOM fetch, only then the fetch waits for the load
+        self._nav_pending = True
+        logger.debug("BrowserWorldModel initialized with objective: %s", self.objective)
+
+    async def _current_page(self) -> Page:
+        page = self._page
+        if page is None or page.is_closed():
+            page = await self._pw.get_current_page()
+            self._page = page
+            self._nav_pending = True
+            page.on("framenavigated", self._on_frame_navigated)
+            if self._watched_context is not page.context:
+                # The newest page becomes the current one, see PlaywrightManager.get_current_page
+                page.context.on("page", self._forget_page)
+                self._watched_context = page.context
+        return page
+
+    def _forget_page(self, *_):
+        self._page = None
+
+    def _on_frame_navigated(self, frame):
+        if frame.parent_frame is None and frame.page is self._page:
+            self._nav_pending = True
 
     async def init_state(self) -> BrowserState:
         # go to home page
-        print(f"{GREEN}[DEBUG] GOING TO INIT STATE HOMEPAGE{RESET}")
-        playwright_manager = PlaywrightManager()
-        await playwright_manager.go_to_homepage()
-        page: Page = await playwright_manager.get_current_page()
+        logger.debug("GOING TO INIT STATE HOMEPAGE")
+        _drop_screenshot_prefetch()
+        await self._pw.go_to_homepage()
+        page: Page = await self._current_page()
 
         # if eval_mode:
         #     await page.set_extra_http_headers({"User-Agent": "AgentQ-Bot"})
@@ -105,9 +377,10 @@ class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
         screenshot = await get_screenshot()
 
         # initialzie dom and url
-        initial_dom = await self.get_current_dom()
-        initial_url = await self.get_current_url()
-        print(f"{GREEN}[DEBUG] Initial state created - URL: {initial_url}{RESET}")
+        initial_dom, initial_url = await asyncio.gather(
+            self.get_current_dom(), self.get_current_url()
+        )
+        logger.debug("Initial state created - URL: %s", initial_url)
 
         return BrowserState(
             web_text=initial_dom,
@@ -120,7 +393,7 @@ class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
     async def step(
         self, state: BrowserState, browser_action: BrowserAction
     ) -> Tuple[BrowserState, dict]:
-        print(f"{YELLOW}[DEBUG] Executing step with action: {browser_action}{RESET}")
+        logger.debug("Executing step with action: %s", browser_action)
         
         try:
             new_dom, new_url, new_base64_img = await self.execute_browser_action(
@@ -135,24 +408,25 @@ class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
             objective=state.objective,
             completed_tasks=new_completed_tasks,
             )
-            print(f"{GREEN}[DEBUG] New state after step - URL: {new_url}{RESET}")
+            logger.debug("New state after step - URL: %s", new_url)
+            _prefetch_screenshot()
             return new_state, {}
         except Exception as e:
-            print(f"{RED}[DEBUG] Error executing browser action: {e}{RESET}")
+            logger.warning("Error executing browser action: %s", e)
             return state, {}
 
     async def is_terminal(self, state: BrowserState) -> bool:
-        print(f"completed_task_world:{state.completed_tasks}")
+        logger.debug("completed_task_world:%s", state.completed_tasks)
         terminal = await is_terminal(state, self.vision, self.critic)
-        print(f"{CYAN}[DEBUG] is_terminal: {terminal}{RESET}")
+        logger.debug("is_terminal: %s", terminal)
         return terminal
 
     async def execute_browser_action(
         self, browser_action: BrowserAction
     ) -> Tuple[str, str, str]:
-        browser_manager = PlaywrightManager(browser_type="chromium", headless=False)
-        await browser_manager.get_browser_context()
-        page = await browser_manager.get_current_page()
+        browser_manager = self._pw
+        page = await self._current_page()
+        _drop_screenshot_prefetch()
 
         async def retry_action(action_func, retries=3, delay=1):
             for attempt in range(retries):
@@ -161,140 +435,44 @@ class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
                     return True
                 except Exception as e:
                     if attempt < retries - 1:
-                        print(f"{RED}[DEBUG] Action failed with error: {e}. Retrying...{RESET}")
+                        logger.warning("Action failed with error: %s. Retrying...", e)
                         await asyncio.sleep(delay)
                     else:
-                        print(f"{RED}[DEBUG] Action failed with error: {e}. No more retries.{RESET}")
+                        logger.warning("Action failed with error: %s. No more retries.", e)
                         return False
 
         for action in browser_action.task_with_action.actions_to_be_performed:
-            print(f"{YELLOW}[DEBUG] Executing browser action: {action.type}{RESET}")
+            logger.debug("Executing browser action: %s", action.type)
             try:
-                if action.type == ActionType.GOTO_URL:
-                    async def goto_url_action():
-                        await openurl(url=action.website, timeout=action.timeout or 1)
-                    if await retry_action(goto_url_action):
-                        print(f"{CYAN}[DEBUG] Went to url{RESET}")
-                elif action.type == ActionType.TYPE:
-                    entry = EnterTextEntry(
-                        query_selector=f"[mmid='{action.mmid}']",
-                        text=action.content,
-                    )
-                    async def type_action():
-                        await page.wait_for_selector(f"[mmid='{action.mmid}']", state='visible', timeout=60000)
-                        await entertext(entry)
-                    if await retry_action(type_action):
-                        print(f"{CYAN}[DEBUG] Typed text into element{RESET}")
-                elif action.type == ActionType.CLICK:
-                    async def click_action():
-                        await page.wait_for_selector(f"[mmid='{action.mmid}']", state='visible', timeout=60000)
-                        await click(
-                            selector=f"[mmid='{action.mmid}']",
-                            wait_before_execution=action.wait_before_execution or 2,
-                        )
-                    if await retry_action(click_action):
-                        print(f"{CYAN}[DEBUG] Clicked element{RESET}")
-                elif action.type == ActionType.ENTER_TEXT_AND_CLICK:
-                    async def enter_text_and_click_action():
-                        result = await enter_text_and_click(
-                            text_selector=f"[mmid='{action.text_element_mmid}']",
-                            text_to_enter=action.text_to_enter,
-                            click_selector=f"[mmid='{action.click_element_mmid}']",
-                            wait_before_click_execution=2,
-                        )
-                        if not result:
-                            raise Exception(f"Failed to enter text '{action.text_to_enter}' into element with selector '[mmid='{action.text_element_mmid}']'. Check that the selector is valid.")
-                    if await retry_action(enter_text_and_click_action):
-                        print(f"{CYAN}[DEBUG] Entered text and clicked element{RESET}")
-                elif action.type == ActionType.HOVER:
-                    async def hover_action():
-                        await page.wait_for_selector(f"[mmid='{action.mmid}']", state='visible', timeout=60000)
-                        await page.hover(selector=f"[mmid='{action.mmid}']")
-                    if await retry_action(hover_action):
-                        print(f"{CYAN}[DEBUG] Hovered over element{RESET}")
-                elif action.type == ActionType.SCROLL:
-                    direction = "up" if "up" in action.direction else "down"
-                    async def scroll_action():
-                        if direction == "up":
-                            await page.evaluate(
-                                "(document.scrollingElement || document.body).scrollTop = (document.scrollingElement || document.body).scrollTop - window.innerHeight;"
-                            )
-                        elif direction == "down":
-                            await page.evaluate(
-                                "(document.scrollingElement || document.body).scrollTop = (document.scrollingElement || document.body).scrollTop + window.innerHeight;"
-                            )
-                    if await retry_action(scroll_action):
-                        print(f"{CYAN}[DEBUG] Scrolled {direction}{RESET}")
-                elif action.type == ActionType.KEY_PRESS:
-                    keys = action.action_str
-                    match = re.search(r"press ?\[(.+)\]", keys)
-                    if not match:
-                        raise ValueError(f"Invalid press action {keys}")
-                    key_comb = match.group(1)
-                    keys = key_comb.split("+")
-                    mapped_keys = []
-                    for key in keys:
-                        mapped_key = SPECIAL_KEY_MAPPINGS.get(key.lower(), key)
-                        mapped_keys.append(mapped_key)
-                    mapped_keys = "+".join(mapped_keys)
-                    async def key_press_action():
-                        await page.keyboard.press(mapped_keys)
-                    if await retry_action(key_press_action):
-                        print(f"{CYAN}[DEBUG] Pressed keys: {mapped_keys}{RESET}")
-                elif action.type == ActionType.NEW_TAB:
-                    async def new_tab_action():
-                        browser_ctx = await browser_manager.get_browser_context()
-                        page = await browser_ctx.new_page()
-                        await page.goto("https://www.google.com")
-                    if await retry_action(new_tab_action):
-                        print(f"{CYAN}[DEBUG] Opened new tab{RESET}")
-                elif action.type == ActionType.GO_BACK:
-                    async def go_back_action():
-                        await page.go_back()
-                    if await retry_action(go_back_action):
-                        print(f"{CYAN}[DEBUG] Navigated back{RESET}")
-                elif action.type == ActionType.GO_FORWARD:
-                    async def go_forward_action():
-                        await page.go_forward()
-                    if await retry_action(go_forward_action):
-                        print(f"{CYAN}[DEBUG] Navigated forward{RESET}")
-                elif action.type == ActionType.PAGE_CLOSE:
-                    async def page_close_action():
-                        await page.close()
-                        pages = await page.context.pages()
-                        if len(pages) == 0:
-                            new_page = await page.context.new_page()
-                            await new_page.goto("https://www.google.com")
-                    if await retry_action(page_close_action):
-                        print(f"{CYAN}[DEBUG] Closed page{RESET}")
-                else:
+                handler = ACTION_HANDLERS.get(action.type)
+                if handler is None:
                     raise ValueError(f"Unknown action type: {action.type}")
+                run_action, done_message = handler(action, page, browser_manager)
+                if await retry_action(run_action):
+                    logger.debug(done_message)
             except Exception as e:
-                print(f"{RED}[DEBUG] Error during action {action.type}: {e}{RESET}")
+                logger.warning("Error during action %s: %s", action.type, e)
                 raise Exception(f"Error during action {action.type}: {e}")
-        try:
-            new_dom = await self.get_current_dom()
-        except Exception as e:
-            print(f"{RED}[DEBUG] Error getting DOM after action: {e}{RESET}")
-            new_dom = "Error: Unable to retrieve DOM"
-            raise  Exception(f"Error getting DOM after action: {e}")
-
-        try:
-            new_url = await self.get_current_url()
-        except Exception as e:
-            print(f"{RED}[DEBUG] Error getting URL after action: {e}{RESET}")
-            new_url = "Error: Unable to retrieve URL"
-            raise  Exception(f"Error getting URL after action: {e}")
+        # DOM and URL are independent page queries, let their round-trips overlap
+        new_dom, new_url = await asyncio.gather(
+            self.get_current_dom(), self.get_current_url(), return_exceptions=True
+        )
+        if isinstance(new_dom, Exception):
+            logger.warning("Error getting DOM after action: %s", new_dom)
+            raise Exception(f"Error getting DOM after action: {new_dom}")
+        if isinstance(new_url, Exception):
+            logger.warning("Error getting URL after action: %s", new_url)
+            raise Exception(f"Error getting URL after action: {new_url}")
         async def retry_screenshot(retries=3, delay=1):
             for attempt in range(retries):
                 try:
                     return await get_screenshot()
                 except Exception as e:
                     if attempt < retries - 1:
-                        print(f"{RED}[DEBUG] Error getting screenshot: {e}. Retrying...{RESET}")
+                        logger.warning("Error getting screenshot: %s. Retrying...", e)
                         await asyncio.sleep(delay)
                     else:
-                        print(f"{RED}[DEBUG] Error getting screenshot: {e}. No more retries.{RESET}")
+                        logger.warning("Error getting screenshot: %s. No more retries.", e)
                         raise  Exception(f"Error getting screenshot: {e}")
 
                         
@@ -308,15 +486,20 @@ class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
     
 
     async def get_current_dom(self) -> str:
-        await wait_for_navigation()
+        page = await self._current_page()
+        if self._nav_pending:
+            # cleared before waiting, a navigation that starts meanwhile sets it again
+            self._nav_pending = False
+            await wait_for_navigation(page=page)
         dom = await get_dom_with_content_type(content_type="all_fields")
-        print(f"{CYAN}[DEBUG] Got current DOM (length: {len(dom)}){RESET}")
-        return str(dom)
+        logger.debug("Got current DOM (length: %s)", len(dom))
+        # all_fields already comes back as text, only convert the structured results
+        return dom if isinstance(dom, str) else str(dom)
 
     async def get_current_url(self) -> str:
         # await wait_for_navigation()
         url = await geturl()
-        print(f"{CYAN}[DEBUG] Got current URL: {url}{RESET}")
+        logger.debug("Got current URL: %s", url)
         return url
 
 
@@ -326,38 +509,28 @@ class BrowserMCTSSearchConfig(SearchConfig[BrowserState, BrowserAction, str]):
         self.actor = actor
         self.critic = critic
         self.vision = vision
-        print(f"{BLUE}[DEBUG] BrowserMCTSSearchConfig initialized{RESET}")
+        logger.debug("BrowserMCTSSearchConfig initialized")
 
     async def get_actions(self, state: BrowserState) -> List[BrowserAction]:
-        print(f"{YELLOW}[DEBUG] Getting actions for current state{RESET}")
+        logger.debug("Getting actions for current state")
         actor_input: AgentQActorInput = AgentQActorInput(
             objective=state.objective,
             completed_tasks=state.completed_tasks,
             current_web_text=state.web_text,
             current_base64_img=state.base64_img,
         )
-        print(f"state.objective:{state.objective}")
-        print(f"state.current_web_text:{state.web_text}")
+        logger.debug("state.objective:%s", state.objective)
+        logger.debug("state.current_web_text:%s", state.web_text)
         actor_output: AgentQActorOutput = await self.actor.run(actor_input)
-        print(f"actor_output:{actor_output}")
-        print(
-            "--------------------------------------------------------------------------------"
-        )
+        logger.debug("actor_output:%s", actor_output)
         proposed_tasks_with_actions: List[TaskWithActions] = actor_output.proposed_tasks
-        print(f"proposed_tasks_with_actions:{proposed_tasks_with_actions}")
-        print(
-            "--------------------------------------------------------------------------------"
-        )
-        print(
-            f"{CYAN}[DEBUG] Number of proposed tasks: {len(proposed_tasks_with_actions)}{RESET}"
-        )
+        logger.debug("proposed_tasks_with_actions:%s", proposed_tasks_with_actions)
+        logger.debug("Number of proposed tasks: %s", len(proposed_tasks_with_actions))
         if not actor_output.is_complete:
             ranked_actions = await self._rank_actions(
                 state, proposed_tasks_with_actions
             )
-            print(
-                f"{CYAN}[DEBUG] Number of sorted actions: {len(ranked_actions)}{RESET}"
-            )
+            logger.debug("Number of sorted actions: %s", len(ranked_actions))
         else:
             for task in proposed_tasks_with_actions:
                 state.completed_tasks.append(task)
@@ -367,15 +540,15 @@ class BrowserMCTSSearchConfig(SearchConfig[BrowserState, BrowserAction, str]):
     async def reward(
         self, state: BrowserState, action: BrowserAction, **kwargs
     ) -> Tuple[float, dict, bool]:
-        print(f"completed_task_reward:{state.completed_tasks}")
+        logger.debug("completed_task_reward:%s", state.completed_tasks)
         terminal_state = await is_terminal(
             state=state, vision=self.vision, critic=self.critic
         )
         if terminal_state:
-            print(f"{GREEN}[DEBUG] Terminal state reached, reward: 1.0{RESET}")
+            logger.debug("Terminal state reached, reward: 1.0")
             return 1.0, {}, True
         else:
-            print(f"{RED}[DEBUG] Non-terminal state, reward: -0.01{RESET}")
+            logger.debug("Non-terminal state, reward: -0.01")
             return -0.01, {}, False
 
     def fast_reward(
@@ -432,42 +605,58 @@ class BrowserMCTSSearchConfig(SearchConfig[BrowserState, BrowserAction, str]):
 
         completed_tasks = state.completed_tasks
         origin_objective = state.objective
-        print(f"completed_tasks:{completed_tasks}")
+        logger.debug("completed_tasks:%s", completed_tasks)
         description = ""
-        is_first = True
-        print(f"{GREEN}[INFO] Sorting task via Critic now...")
-        for task in remaining_tasks:
-            if not remaining_tasks:
-                break
-
-            critic_input = AgentQCriticInput(
-                history_completed_tasks=state.completed_tasks,
-                current_task=task,
-                current_base64_img=state.base64_img,
+        logger.info("Sorting task via Critic now...")
+        # The critic calls of different tasks don't depend on each other, send them all at once
+        critic_outputs: List[AgentQCriticOutput] = await asyncio.gather(
+            *(
+                self.critic.run(
+                    AgentQCriticInput(
+                        history_completed_tasks=state.completed_tasks,
+                        current_task=task,
+                        current_base64_img=state.base64_img,
+                    )
+                )
+                for task in remaining_tasks
             )
+        )
+        if critic_outputs:
+            description = critic_outputs[0].description
 
-            critic_output: AgentQCriticOutput = await self.critic.run(critic_input)
-            if is_first:
-                description = critic_output.description
-                is_first = False
-            predict_objective = critic_output.predict_objective
-
-            # 计算origin_objective和predict_objective之间的相似度
-
-            check_input = VisionInput(
-                origin_instruction=state.objective,
-                predict_instruction=predict_objective,
-                done_description=description,
+        # 计算origin_objective和predict_objective之间的相似度
+        # Every check compares against the first task's description, so they can all be sent at once too
+        check_outputs: List[VisionOutput] = await asyncio.gather(
+            *(
+                self.vision.run(
+                    VisionInput(
+                        origin_instruction=state.objective,
+                        predict_instruction=critic_output.predict_objective,
+                        done_description=description,
+                    )
+                )
+                for critic_output in critic_outputs
             )
-            check_output: VisionOutput = await self.vision.run(check_input)
+        )
+
+        for task, critic_output, check_output in zip(
+            remaining_tasks, critic_outputs, check_outputs
+        ):
+            predict_objective = critic_output.predict_objective
             check_similarity = check_output.similarity
             check_completion = check_output.completion
 
-            print(
-                f"Similarity between '{origin_objective}' and '{predict_objective}': {check_similarity}"
+            logger.debug(
+                "Similarity between '%s' and '%s': %s",
+                origin_objective,
+                predict_objective,
+                check_similarity,
             )
-            print(
-                f"Comletion between '{description}' and '{predict_objective}': {check_completion}"
+            logger.debug(
+                "Comletion between '%s' and '%s': %s",
+                description,
+                predict_objective,
+                check_completion,
             )
             if description and predict_objective:
                 rank = (
@@ -475,21 +664,24 @@ class BrowserMCTSSearchConfig(SearchConfig[BrowserState, BrowserAction, str]):
                 )  # Higher rank for earlier iterations
                 ranked_actions.append(BrowserAction(task_with_action=task, rank=rank))
             else:
-                print(
-                    f"{MAGENTA}[DEBUG] Warning: No valid  task found in remaining tasks. Skipping.{RESET}"
-                )
-            print("---------------------------------------------------------------")
+                logger.warning("No valid  task found in remaining tasks. Skipping.")
         # 在循环结束后对ranked_actions按照rank降序排序
         ranked_actions.sort(key=lambda x: x.rank, reverse=True)
-        print(f"{CYAN}[DEBUG] Sorted actions.")
+        logger.debug("Sorted actions.")
         return ranked_actions
 
 
 async def is_terminal(
     state: BrowserState, vision: BaseAgent, critic: BaseAgent
 ) -> bool:
-    print(f"{YELLOW}[DEBUG] Checking if state is terminal{RESET}")
-    screenshot = await get_screenshot()
+    logger.debug("Checking if state is terminal")
+    screenshot = await _get_screenshot()
+    # MCTS revisits the same pages during rollouts, don't ask the LLMs again about a page they already judged
+    cache_key = _terminal_cache_key("state", state, screenshot)
+    cached_terminal = _get_cached_terminal(cache_key)
+    if cached_terminal is not None:
+        logger.debug("Cached output of vision LLM %s", cached_terminal)
+        return cached_terminal
     origin_objective = state.objective
     critic_input = AgentQCriticInput(
         history_completed_tasks=state.completed_tasks,
@@ -511,20 +703,30 @@ async def is_terminal(
     check_similarity = check_output.similarity
     check_completion = check_output.completion
 
-    print(
-        f"Similarity between '{origin_objective}' and '{predict_objective}': {check_similarity}"
+    logger.debug(
+        "Similarity between '%s' and '%s': %s",
+        origin_objective,
+        predict_objective,
+        check_similarity,
     )
-    print(
-        f"Comletion between '{description}' and '{predict_objective}': {check_completion}"
+    logger.debug(
+        "Comletion between '%s' and '%s': %s",
+        description,
+        predict_objective,
+        check_completion,
     )
     # similarity = jellyfish.jaro_winkler_similarity(origin_objective, predict_objective)
 
     is_check = check_similarity * check_completion
-    print(
-        f"is_check between '{origin_objective}' and '{predict_objective}': {is_check}"
+    logger.debug(
+        "is_check between '%s' and '%s': %s",
+        origin_objective,
+        predict_objective,
+        is_check,
     )
     terminal = is_check > 0.8
-    print(f"{YELLOW}[DEBUG] Output of vision LLM {terminal}{RESET}")
+    logger.debug("Output of vision LLM %s", terminal)
+    _cache_terminal(cache_key, terminal)
     return terminal
 
 
@@ -552,26 +754,36 @@ class BrowserMCTSWrapper(Reasoner[BrowserState, BrowserAction, str]):
         )
         super().__init__(world_model, search_config, search_algo)
         self.dpo_pairs = []
-        print(
-            f"{BLUE}[DEBUG] BrowserMCTSWrapper initialized with objective: {objective}{RESET}"
-        )
+        logger.debug("BrowserMCTSWrapper initialized with objective: %s", objective)
 
     async def __call__(self) -> MCTSResult:
-        print(f"{YELLOW}[DEBUG] Starting MCTS search{RESET}")
+        logger.debug("Starting MCTS search")
         result = await super().__call__("")
         return result
 
     @staticmethod
-    def generate_dpo_pairs(result: MCTSResult) -> List[DPOPair]:
+    def generate_dpo_pairs(
+        result: MCTSResult, max_pairs: Optional[int] = None
+    ) -> List[DPOPair]:
+        """
+        Pair the action taken on the best path with every other child action of the same node.
+
+        Args:
+            result (MCTSResult): The result of the MCTS search.
+            max_pairs (Optional[int]): Stop once this many pairs are generated. None for no limit.
+
+        Returns:
+            List[DPOPair]: The generated pairs, in trace order.
+        """
         dpo_pairs = []
 
         if result.trace_of_nodes is None or len(result.trace_of_nodes) < 2:
-            print(f"{RED}[DEBUG] No valid path found{RESET}")
+            logger.warning("No valid path found")
             return []
 
-        print(f"{BLUE}[DEBUG] Printing rewards before generating dpo pairs")
+        logger.debug("Printing rewards before generating dpo pairs")
         for i, node in enumerate(result.trace_of_nodes):
-            print(f"{BLUE} {node.state.current_url} - {node.Q}")
+            logger.debug("%s - %s", node.state.current_url, node.Q)
 
         for i in range(len(result.trace_of_nodes) - 1):
             current_node = result.trace_of_nodes[i]
@@ -579,29 +791,37 @@ class BrowserMCTSWrapper(Reasoner[BrowserState, BrowserAction, str]):
 
             if current_node.children:
                 winning_action = next_node.action
-                for child in current_node.children:
-                    if child.action != winning_action:
-                        dpo_pair = DPOPair(
-                            state=DPOState(
-                                dom=current_node.state.web_text[
-                                    :1000
-                                ],  # Truncate DOM to first 1000 characters
-                                objective=current_node.state.objective,
-                            ),
-                            winning_action=DPOAction(
-                                description=winning_action.task_with_action.description,
-                                action=winning_action.task_with_action.actions_to_be_performed[
-                                    0
-                                ],
-                            ),
-                            losing_action=DPOAction(
-                                description=child.action.task_with_action.description,
-                                action=child.action.task_with_action.actions_to_be_performed[
-                                    0
-                                ],
-                            ),
-                        )
-                        dpo_pairs.append(dpo_pair)
+                losing_children = [
+                    child
+                    for child in current_node.children
+                    if child.action != winning_action
+                ]
+                if not losing_children:
+                    continue
+
+                # The state and the winning action are the same for every pair of this node, build them once
+                dpo_state = DPOState(
+                    dom=current_node.state.dom_prefix,
+                    objective=current_node.state.objective,
+                )
+                winning_dpo_action = DPOAction(
+                    description=winning_action.task_with_action.description,
+                    action=winning_action.task_with_action.actions_to_be_performed[0],
+                )
+                for child in losing_children:
+                    if max_pairs is not None and len(dpo_pairs) >= max_pairs:
+                        return dpo_pairs
+                    dpo_pair = DPOPair(
+                        state=dpo_state,
+                        winning_action=winning_dpo_action,
+                        losing_action=DPOAction(
+                            description=child.action.task_with_action.description,
+                            action=child.action.task_with_action.actions_to_be_performed[
+                                0
+                            ],
+                        ),
+                    )
+                    dpo_pairs.append(dpo_pair)
 
         return dpo_pairs
 
@@ -656,21 +876,49 @@ class BrowserMCTSWrapper(Reasoner[BrowserState, BrowserAction, str]):
         """
         Write the generated DPO pairs to a JSONL file in a format optimized for DPO training scripts.
         """
-        with open(filename, "w") as f:
-            for pair in dpo_pairs:
-                dpo_entry = {
-                    "prompt": f"Objective: {pair.state.objective}\nCurrent DOM: {pair.state.dom[:1000]}...",
-                    "chosen": f"Action: {pair.winning_action.action.model_dump_json()}\nDescription: {pair.winning_action.description}",
-                    "rejected": f"Action: {pair.losing_action.action.model_dump_json()}\nDescription: {pair.losing_action.description}",
+        dumps = orjson.dumps if orjson is not None else lambda entry: json.dumps(entry).encode("utf-8")
+
+        # generate_dpo_pairs shares one state and one winning action between all pairs of a node,
+        # so render each of those objects once (keyed by id, they are all alive for this call)
+        rendered = {}
+
+        def render(obj, to_text):
+            text = rendered.get(id(obj))
+            if text is None:
+                text = rendered[id(obj)] = to_text(obj)
+            return text
+
+        def prompt(state: DPOState) -> str:
+            return f"Objective: {state.objective}\nCurrent DOM: {state.dom[:1000]}..."
+
+        def action_text(dpo_action: DPOAction) -> str:
+            return f"Action: {dpo_action.action.model_dump_json()}\nDescription: {dpo_action.description}"
+
+        lines = [
+            dumps(
+                {
+                    "prompt": render(pair.state, prompt),
+                    "chosen": render(pair.winning_action, action_text),
+                    "rejected": render(pair.losing_action, action_text),
                 }
-                json.dump(dpo_entry, f)
-                f.write("\n")  # Add a newline for JSONL format
+            )
+            + b"\n"  # Add a newline for JSONL format
+            for pair in dpo_pairs
+        ]
+        # Serialize everything first and write it in one go off the event loop
+        await asyncio.to_thread(Path(filename).write_bytes, b"".join(lines))
 
-        print(f"{GREEN}[INFO] DPO pairs written to {filename} in JSONL format{RESET}")
+        logger.info("DPO pairs written to %s in JSONL format", filename)
 
     async def is_terminal(self, state: BrowserState) -> bool:
-        print(f"{YELLOW}[DEBUG] Checking if state is terminal{RESET}")
-        screenshot = await get_screenshot()
+        logger.debug("Checking if state is terminal")
+        screenshot = await _get_screenshot()
+        # Its critic input differs slightly (current_task=[]), so its verdicts are cached apart from is_terminal's
+        cache_key = _terminal_cache_key("wrapper", state, screenshot)
+        cached_terminal = _get_cached_terminal(cache_key)
+        if cached_terminal is not None:
+            logger.debug("Cached output of vision LLM %s", cached_terminal)
+            return cached_terminal
         origin_objective = state.objective
         critic_input = AgentQCriticInput(
             history_completed_tasks=state.completed_tasks,
@@ -692,43 +940,65 @@ class BrowserMCTSWrapper(Reasoner[BrowserState, BrowserAction, str]):
         check_similarity = check_output.similarity
         check_completion = check_output.completion
 
-        print(
-            f"Similarity between '{origin_objective}' and '{predict_objective}': {check_similarity}"
+        logger.debug(
+            "Similarity between '%s' and '%s': %s",
+            origin_objective,
+            predict_objective,
+            check_similarity,
         )
-        print(
-            f"Comletion between '{description}' and '{predict_objective}': {check_completion}"
+        logger.debug(
+            "Comletion between '%s' and '%s': %s",
+            description,
+            predict_objective,
+            check_completion,
         )
         # similarity = jellyfish.jaro_winkler_similarity(origin_objective, predict_objective)
 
         is_check = check_similarity * check_completion
-        print(
-            f"is_check between '{origin_objective}' and '{predict_objective}': {is_check}"
+        logger.debug(
+            "is_check between '%s' and '%s': %s",
+            origin_objective,
+            predict_objective,
+            is_check,
         )
         terminal = is_check > 0.8
-        print(f"{YELLOW}[DEBUG] Output of vision LLM {terminal}{RESET}")
+        logger.debug("Output of vision LLM %s", terminal)
+        _cache_terminal(cache_key, terminal)
         return terminal
 
 
-async def wait_for_navigation(max_retries=3):
+async def wait_for_navigation(
+    max_retries=3, page: Optional[Page] = None, initial_timeout: int = 3000
+):
+    # The timeout starts short and doubles on every attempt (3s, 6s, 12s by default) instead of 30s each
     for attempt in range(max_retries):
+        timeout = initial_timeout * 2**attempt
         try:
-            playwright_manager = PlaywrightManager()
-            page = await playwright_manager.get_current_page()
-            await page.wait_for_load_state("domcontentloaded", timeout=30000)
-            print(
-                f"{GREEN}[DEBUG] Navigation successful on attempt {attempt + 1}{RESET}"
-            )
+            if page is None:
+                page = await _get_manager().get_current_page()
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout)
+            logger.debug("Navigation successful on attempt %s", attempt + 1)
             return
+        except PlaywrightTimeoutError as e:
+            # Some pages (SPAs, long-polling) already have a usable DOM without the event ever arriving
+            try:
+                ready_state = await page.evaluate("document.readyState")
+            except Exception:
+                ready_state = None
+            if ready_state in ("interactive", "complete"):
+                logger.debug("Document %s after %sms timeout, treating as loaded", ready_state, timeout)
+                return
+            logger.warning("Navigation error on attempt %s: %s", attempt + 1, e)
         except Exception as e:
-            print(
-                f"{YELLOW}[DEBUG] Navigation error on attempt {attempt + 1}: {str(e)}{RESET}"
-            )
-    print(f"{RED}[DEBUG] Navigation failed after {max_retries} attempts{RESET}")
+            logger.warning("Navigation error on attempt %s: %s", attempt + 1, e)
+            if page is not None and page.is_closed():
+                page = None  # look the current page up again on the next attempt
+    logger.warning("Navigation failed after %s attempts", max_retries)
 
 
 async def main(objective: str = None, eval_mode: bool = False):
     print(f"{BLUE}Starting MCTS{RESET}")
-    playwright_manager = PlaywrightManager()
+    playwright_manager = _get_manager()
 
     if not eval_mode:
         await playwright_manager.async_initialize()
@@ -779,11 +1049,11 @@ async def main(objective: str = None, eval_mode: bool = False):
 # Temp class to write output to a file
 class StreamToFile:
     def __init__(self, filename):
-        self.file = open(filename, "w", buffering=1)
+        # block buffered, written out when the buffer fills up or on flush() / close()
+        self.file = open(filename, "w", buffering=65536)
 
     def write(self, data):
         self.file.write(data)
-        self.file.flush()
 
     def flush(self):
         self.file.flush()
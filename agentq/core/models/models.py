@@ -1,4 +1,5 @@
 from enum import Enum, IntEnum
+from functools import cached_property
 from typing import List, Literal, Optional, Union
 
 from pydantic import BaseModel
@@ -381,6 +382,11 @@ class BrowserState(BaseModel):
     completed_tasks: Optional[List[TaskWithActions]]
     done_description: str
 
+    @cached_property
+    def dom_prefix(self) -> str:
+        # First 1000 characters of the DOM, as stored in the DPO pairs. Sliced once per state.
+        return self.web_text[:1000]
+
 
 class BrowserAction(BaseModel):
     task_with_action: TaskWithActions
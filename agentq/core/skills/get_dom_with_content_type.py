@@ -67,11 +67,16 @@ async def get_dom_with_content_type(
     user_success_message = ""
     if content_type == "all_fields":
         user_success_message = "Fetched all the fields in the DOM"
-        extracted_data = await do_get_accessibility_info(page, only_input_fields=False)
+        # PlaywrightManager always drives Chromium, so the tree can come straight from CDP
+        extracted_data = await do_get_accessibility_info(
+            page, only_input_fields=False, use_cdp_snapshot=True
+        )
         # print(f'extracted_data:\n{extracted_data}')
     elif content_type == "input_fields":
         logger.debug("Fetching DOM for input_fields")
-        extracted_data = await do_get_accessibility_info(page, only_input_fields=True)   
+        extracted_data = await do_get_accessibility_info(
+            page, only_input_fields=True, use_cdp_snapshot=True
+        )
         if extracted_data is None:
             return "Could not fetch input fields. Please consider trying with content_type all_fields."
         user_success_message = "Fetched only input fields in the DOM"
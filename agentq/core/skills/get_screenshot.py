@@ -11,7 +11,9 @@ from agentq.utils.logger import logger
 
 async def get_screenshot(
     webpage: Optional[Page] = None,
-    folder_path: Optional[Path] = None
+    folder_path: Optional[Path] = None,
+    image_format: str = "png",
+    quality: Optional[int] = None,
 ) -> Annotated[
     tuple[str, str], "Returns a tuple with a base64 encoded screenshot and the file path of the saved screenshot."
 ]:
@@ -19,6 +21,12 @@ async def get_screenshot(
     Captures and returns a base64 encoded screenshot of the current page (only the visible viewport and not the full page),
     and saves the screenshot to a file.
 
+    Parameters:
+    - webpage: The page to capture. Defaults to the current page.
+    - folder_path: Sub folder of result/IL_1 to save the screenshot in. Not saved when None.
+    - image_format: "png" or "jpeg". JPEG screenshots are several times smaller, which matters for vision model inputs.
+    - quality: JPEG quality (0-100), only used with "jpeg".
+
     Returns:
     - Tuple containing:
       - Base64 encoded string of the screenshot image.
@@ -42,7 +50,12 @@ async def get_screenshot(
 
         # Capture the screenshot
         logger.info("about to capture")
-        screenshot_bytes = await page.screenshot(full_page=False, timeout=60000)
+        screenshot_bytes = await page.screenshot(
+            full_page=False,
+            timeout=60000,
+            type=image_format,
+            quality=quality if image_format == "jpeg" else None,
+        )
 
         # Encode the screenshot as base64
         base64_screenshot = base64.b64encode(screenshot_bytes).decode("utf-8")
@@ -61,7 +74,7 @@ async def get_screenshot(
             folder_name.mkdir(parents=True, exist_ok=True)  # 确保子文件夹存在
             
             # 构造截图文件路径
-            file_path = folder_name / f"screenshot_{timestamp}.png"
+            file_path = folder_name / f"screenshot_{timestamp}.{image_format}"
             
             # 确保路径为绝对路径
             file_path = file_path.resolve()
@@ -69,7 +82,7 @@ async def get_screenshot(
             with open(file_path, "wb") as f:
                 f.write(screenshot_bytes)
 
-        return f"data:image/png;base64,{base64_screenshot}", str(file_path)
+        return f"data:image/{image_format};base64,{base64_screenshot}", str(file_path)
 
     except Exception as e:
         raise ValueError(
@@ -9,6 +9,7 @@ from agentq.utils.dom_mutation_observer import (
     dom_mutation_change_detected,
     handle_navigation_for_mutation_observer,
 )
+from agentq.utils.dom_scripts import PAGE_SCRIPTS
 from agentq.utils.logger import logger
 from agentq.utils.ui_messagetype import MessageType
 
@@ -265,6 +266,17 @@ class PlaywrightManager:
             else:
                 raise e from None
 
+        await self.install_page_scripts()
+
+    async def install_page_scripts(self):
+        """
+        Registers the DOM helper scripts as context init scripts so that every page (and every navigation)
+        gets them compiled once at load time instead of on each page.evaluate.
+        """
+        for script in PAGE_SCRIPTS:
+            await PlaywrightManager._browser_context.add_init_script(script=script)
+        logger.debug("Page helper scripts installed on the browser context")
+
     async def get_browser_context(self):
         """
         Returns the existing browser context, or creates a new one if it doesn't exist.
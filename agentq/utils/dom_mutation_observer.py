@@ -30,13 +30,14 @@ async def add_mutation_observer(page: Page):
 
     await page.evaluate("""
         console.log('Adding a mutation observer for DOM changes');
+        const IGNORED_TAGS = new Set(['SCRIPT', 'NOSCRIPT', 'STYLE']);
         new MutationObserver((mutationsList, observer) => {
             let changes_detected = [];
             for(let mutation of mutationsList) {
                 if (mutation.type === 'childList') {
                     let allAddedNodes=mutation.addedNodes;
                     for(let node of allAddedNodes) {
-                        if(node.tagName && !['SCRIPT', 'NOSCRIPT', 'STYLE'].includes(node.tagName) && !node.closest('#agentDriveAutoOverlay')) {
+                        if(node.tagName && !IGNORED_TAGS.has(node.tagName) && !node.closest('#agentDriveAutoOverlay')) {
                             let visibility=true;
                             let content = node.innerText.trim();
                             if(visibility && node.innerText.trim()){
@@ -48,7 +49,7 @@ async def add_mutation_observer(page: Page):
                     }
                 } else if (mutation.type === 'characterData') {
                     let node = mutation.target;
-                    if(node.parentNode && !['SCRIPT', 'NOSCRIPT', 'STYLE'].includes(node.parentNode.tagName) && !node.parentNode.closest('#agentDriveAutoOverlay')) {
+                    if(node.parentNode && !IGNORED_TAGS.has(node.parentNode.tagName) && !node.parentNode.closest('#agentDriveAutoOverlay')) {
                         let visibility=true;
                         let content = node.data.trim();
                         if(visibility && content && window.getComputedStyle(node.parentNode).display !== 'none'){
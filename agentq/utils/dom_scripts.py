@@ -0,0 +1,545 @@
+# Page-side helpers that are installed once per browser context (see PlaywrightManager.install_page_scripts)
+# so that the DOM sync only ships a tiny call expression to the renderer instead of re-sending and
+# re-compiling the full function source on every page.evaluate.
+
+MMID_EXTRACT_JS = """
+(() => {
+    // Tags kept by the strict filter (strict_tag_filter), anything else needs an onclick link or a pointer cursor
+    const VALID_TAGS = new Set([
+        "INPUT", "TEXTAREA", "SELECT", "BUTTON", "A", "IFRAME", "VIDEO", "LI", "TD", "OPTION"
+    ]);
+    // Tags skipped by the loose filter
+    const TAGS_TO_IGNORE = new Set([
+        "head", "style", "script", "link", "meta", "noscript", "template", "iframe", "g", "main", "c-wiz", "svg", "path"
+    ]);
+
+    // Attributes to fetch for each element
+    const ATTRIBUTES = new Set(["name", "aria-label", "placeholder", "mmid", "id", "for", "data-testid"]);
+    const IDS_TO_IGNORE = new Set(["agentDriveAutoOverlay"]);
+    const ATTRS_TO_INCLUDE = new Set(['mmid', 'role', 'aria-label', 'value']);
+    const ATTRS_TO_EXCLUDE = new Set(['width', 'height', 'path', 'class', 'viewBox', 'mmid']);
+    const MINIMAL_KEYS = new Set(['tag', 'mmid']);
+
+    // Drops the fields that only repeat each other once the DOM attributes are merged over the accessibility node.
+    // Keys that may come from the accessibility node are reported in '_drop' so that the caller removes them too.
+    function dedupe(attributes_to_values, ax_node, strict) {
+        const node = Object.assign({}, ax_node, attributes_to_values);
+        let name = node["name"];
+        let description = node["description"];
+        let aria_label = node["aria-label"];
+        let role = node["role"];
+        const tag = node["tag"];
+        const to_delete = [];
+        let link_text = null;
+
+        if (name === node["mmid"] && role !== "textbox") {
+            to_delete.push("name");
+            name = undefined;
+        }
+
+        if (name != null && description != null &&
+            (name === description || name === description.replace(/\\n/g, " ") ||
+             (!strict && name.includes(description.replace(/\\n/g, ""))))) {
+            to_delete.push("description");
+            description = undefined;
+        }
+
+        if (name != null && aria_label != null && name.includes(aria_label)) {
+            to_delete.push("aria-label");
+            aria_label = undefined;
+        }
+
+        if (!strict && name != null && name === node["text"]) {
+            to_delete.push("text");
+        }
+
+        // children are not needed for select menus since "options" attribute is already added
+        if (tag === "select") {
+            to_delete.push("children", "role", "description");
+            role = description = undefined;
+        }
+
+        // role and tag can have the same info. Get rid of role if it is the same as tag
+        if (role === tag) {
+            to_delete.push("role");
+            role = undefined;
+        }
+
+        // avoid duplicate aria-label
+        if (aria_label && aria_label === node["placeholder"]) {
+            to_delete.push("aria-label");
+        }
+
+        if (role === "link") {
+            to_delete.push("role");
+            if (description) {
+                link_text = description;
+                to_delete.push("description");
+            }
+        }
+
+        for (const key of to_delete) {
+            delete attributes_to_values[key];
+        }
+        if (link_text) {
+            attributes_to_values["text"] = link_text;
+        }
+        if (to_delete.length > 0) {
+            attributes_to_values["_drop"] = to_delete;
+        }
+        return attributes_to_values;
+    }
+
+    // Extra details of the loose filter: listbox items, and the children of buttons that have nothing else to show.
+    // Returns null when the element has nothing beyond the minimal keys.
+    function addLooseDetails(element, tagLc, attributes_to_values) {
+        let role = element.getAttribute('role');
+        if(role==='listbox' || tagLc=== 'ul'){
+            let children=element.children;
+            attributes_to_values["additional_info"]=[]
+            for (const child of children) {
+                let children_attributes_to_values = {};
+
+                for (let attr of child.attributes) {
+                    // If the attribute is not in the predefined list, add it to children_attributes_to_values
+                    if (ATTRS_TO_INCLUDE.has(attr.name)) {
+                        children_attributes_to_values[attr.name] = attr.value;
+                    }
+                }
+
+                attributes_to_values["additional_info"].push(children_attributes_to_values);
+            }
+        }
+        // 'tag' is always there, so any key outside the minimal ones means more than minimal
+        const hasMoreThanMinimalKeys = Object.keys(attributes_to_values).some(key => !MINIMAL_KEYS.has(key));
+
+        //if no attributes were found, then return null, which will cause this element to be skipped
+        if (!hasMoreThanMinimalKeys) {
+            if (tagLc === 'button') {
+                    attributes_to_values["mmid"] = element.getAttribute('mmid');
+                    attributes_to_values["role"] = "button";
+                    attributes_to_values["additional_info"] = [];
+                    let children=element.children;
+
+                    // Check if the button has no text and no attributes
+                    if (element.innerText.trim() === '') {
+
+                        for (const child of children) {
+                            let children_attributes_to_values = {};
+
+                            for (let attr of child.attributes) {
+                                // If the attribute is not in the predefined list, add it to children_attributes_to_values
+                                if (!ATTRS_TO_EXCLUDE.has(attr.name)) {
+                                    children_attributes_to_values[attr.name] = attr.value;
+                                }
+                            }
+
+                            attributes_to_values["additional_info"].push(children_attributes_to_values);
+                        }
+                        return attributes_to_values;
+                    }
+            }
+
+            return null; // Return null if only minimal keys are present
+        }
+        return attributes_to_values;
+    }
+
+    window.__mmidExtract = function (input_params) {
+        const strict = input_params.strict_tag_filter;
+
+        // Restore the page's own aria-keyshortcuts in the same trip, the snapshot that needed ours is already taken
+        if (input_params.cleanup_dom && window.__mmidCleanup) {
+            window.__mmidCleanup();
+        }
+
+        // Index the marked elements once instead of a querySelector per mmid; first match wins, like querySelector
+        const elementsByMmid = new Map();
+        for (const el of document.querySelectorAll('[mmid]')) {
+            const key = el.getAttribute('mmid');
+            if (!elementsByMmid.has(key)) elementsByMmid.set(key, el);
+        }
+
+        // Index the elements referencing an id through aria-labelledby, so the textbox lookup below needs no extra query
+        const ariaLabelledByIndex = new Map();
+        for (const el of document.querySelectorAll('[aria-labelledby]')) {
+            const elMmid = el.getAttribute('mmid');
+            if (!elMmid) continue;
+            for (const id of el.getAttribute('aria-labelledby').split(/\\s+/)) {
+                if (id && !ariaLabelledByIndex.has(id)) {
+                    ariaLabelledByIndex.set(id, {"mmid": elMmid, "tag": el.tagName.toLowerCase()});
+                }
+            }
+        }
+
+        // Elements the strict tag check can't decide fall back to the computed cursor; read those styles in one tight
+        // loop up front so the per-element pass below doesn't interleave style reads with its other DOM work
+        const pointerElements = new Set();
+        if (strict) {
+            for (const mmid of input_params.mmids) {
+                const el = elementsByMmid.get(String(mmid));
+                if (el && !VALID_TAGS.has(el.tagName) && !(el.tagName === "A" && el.onclick) &&
+                    window.getComputedStyle(el).cursor === "pointer") {
+                    pointerElements.add(el);
+                }
+            }
+        }
+
+        function extract(element, should_fetch_inner_text) {
+            if (IDS_TO_IGNORE.has(element.id)) {
+                console.log(`Ignoring element with id: ${element.id}`, element);
+                return null;
+            }
+
+            const tag = element.tagName;
+            const tagLc = tag.toLowerCase();
+
+            if (strict) {
+                // Check if the element's tag is valid
+                if (!VALID_TAGS.has(tag) &&
+                    !(tag === "A" && element.onclick) &&
+                    !pointerElements.has(element)) {
+                    return null;  // If the element does not match the filtering conditions, skip it
+                }
+            }
+            //Ignore "option" because it would have been processed with the select element
+            else if (TAGS_TO_IGNORE.has(tagLc) || tagLc === "option") {
+                return null;
+            }
+
+            let attributes_to_values = {
+                'tag': tagLc // Always include the tag name
+            };
+
+            // If the element is an input, include its type as well
+            if (tagLc === 'input') {
+                attributes_to_values['tag_type'] = element.type; // This will capture 'checkbox', 'radio', etc.
+            }
+            else if (tagLc === 'select') {
+                attributes_to_values["mmid"] = element.getAttribute('mmid');
+                attributes_to_values["role"] = "combobox";
+                attributes_to_values["options"] = [];
+
+                for (const option of element.options) {
+                    let option_attributes_to_values = {
+                        "mmid": option.getAttribute('mmid'),
+                        "text": option.text,
+                        "value": option.value,
+                        "selected": option.selected
+                    };
+                    attributes_to_values["options"].push(option_attributes_to_values);
+                }
+                return attributes_to_values;
+            }
+
+            // One pass over the attributes the element actually has, most of the wanted ones are usually absent
+            for (const attribute of element.attributes) {
+                if (attribute.value && ATTRIBUTES.has(attribute.name)) {
+                    attributes_to_values[attribute.name] = attribute.value;
+                }
+            }
+
+            // innerText forces a layout: read it once, and not at all for elements without child nodes (always '')
+            const inner_text = should_fetch_inner_text && element.firstChild ? element.innerText : '';
+            if (inner_text) {
+                attributes_to_values['description'] = inner_text;
+            }
+
+            if (!strict) {
+                return addLooseDetails(element, tagLc, attributes_to_values);
+            }
+
+            // Only return attributes if mmid is present
+            if (attributes_to_values["mmid"]) {
+                return attributes_to_values;
+            }
+
+            return null;  // Skip if no mmid found
+        }
+
+        // Flat rows rather than an object keyed by mmid: smaller to serialize and faster to parse on the Python side
+        // The accessibility fields come column-wise (one array per field), rebuild the node of a row on demand
+        const axColumns = input_params.ax_columns;
+        function axNodeAt(index) {
+            const ax_node = {};
+            for (const key in axColumns) {
+                const value = axColumns[key][index];
+                if (value !== null && value !== undefined) ax_node[key] = value;
+            }
+            return ax_node;
+        }
+
+        const rows = [];
+        input_params.mmids.forEach((mmid, index) => {
+            const element = elementsByMmid.get(String(mmid));
+            if (!element) {
+                console.log(`No element found with mmid: ${mmid}`);
+                return;
+            }
+
+            const element_attributes = extract(element, input_params.should_fetch_inner_text[index]);
+            if (element_attributes) {
+                if (element.id && ariaLabelledByIndex.has(element.id)) {
+                    element_attributes['_labelled_element'] = ariaLabelledByIndex.get(element.id);
+                }
+                dedupe(element_attributes, axNodeAt(index), strict);
+                rows.push(Object.assign({_mmid: mmid}, element_attributes));
+            }
+        });
+        return rows;
+    };
+})();
+"""
+
+MMID_INJECTOR_JS = """
+(() => {
+    window.__injectMmids = function (visualOverlay) {
+        let labels = [];
+        let markedElements = new WeakSet(); // 用于存储已标记的元素，防止重复标记
+        let lastMmid = 0;
+        const WS_RE = /\\s{2,}/g;
+        const INTERACTIVE_SELECTOR = 'button, a[href], input, select, textarea, [contenteditable], [tabindex], [role="button"], [role="link"], [role="checkbox"], [role="menuitem"], [role="option"], [role="radio"], [role="switch"], [role="tab"], [role="treeitem"]';
+
+        // Inject mmid into an element, keeping any original 'aria-keyshortcuts' aside
+        function markElement(element) {
+            const origAriaAttribute = element.getAttribute('aria-keyshortcuts');
+            lastMmid++;
+            element.setAttribute('mmid', lastMmid);
+            element.setAttribute('aria-keyshortcuts', lastMmid);
+            if (origAriaAttribute) {
+                element.setAttribute('orig-aria-keyshortcuts', origAriaAttribute);
+            }
+            markedElements.add(element);
+        }
+
+        function markPage() {
+            // Level 0: read all the geometry and style the marking needs, nothing is written to the DOM until level 1
+            var vw = Math.max(document.documentElement.clientWidth || 0, window.innerWidth || 0);
+            var vh = Math.max(document.documentElement.clientHeight || 0, window.innerHeight || 0);
+
+            var items = Array.prototype.slice.call(
+                document.querySelectorAll('*')
+            ).map(function(element) {
+                // Elements inside display:none subtrees have no offsetParent; skip them before getClientRects() forces a layout
+                if (element.offsetParent === null && element.tagName !== 'BODY' && window.getComputedStyle(element).position !== 'fixed') {
+                    return null;
+                }
+
+                var rects = [...element.getClientRects()].filter(bb => {
+                    var center_x = bb.left + bb.width / 2;
+                    var center_y = bb.top + bb.height / 2;
+                    var elAtCenter = document.elementFromPoint(center_x, center_y);
+
+                    return elAtCenter === element || element.contains(elAtCenter);
+                }).map(bb => {
+                    const rect = {
+                        left: Math.max(0, bb.left),
+                        top: Math.max(0, bb.top),
+                        right: Math.min(vw, bb.right),
+                        bottom: Math.min(vh, bb.bottom)
+                    };
+                    return {
+                        ...rect,
+                        width: rect.right - rect.left,
+                        height: rect.bottom - rect.top
+                    }
+                });
+
+                var area = rects.reduce((acc, rect) => acc + rect.width * rect.height, 0);
+
+                return {
+                    element: element,
+                    include: 
+                        (element.tagName === "INPUT" || element.tagName === "TEXTAREA" || element.tagName === "SELECT") ||
+                        (element.tagName === "BUTTON" || element.tagName === "A" || (element.onclick != null) || window.getComputedStyle(element).cursor == "pointer") ||
+                        (element.tagName === "IFRAME" || element.tagName === "VIDEO" || element.tagName === "LI" || element.tagName === "TD" || element.tagName === "OPTION"),
+                    area,
+                    rects,
+                    tagName: element.tagName,
+                    type: element.getAttribute("type") || '',
+                    ariaLabel: element.getAttribute("aria-label") || ''
+                };
+            }).filter(item =>
+                item && item.include && (item.area >= 20)
+            );
+
+            // Filter out unnecessary buttons and elements
+            const buttons = Array.from(document.querySelectorAll('button, a, input[type="button"], div[role="button"]'));
+            items = items.filter(x => !buttons.some(y => items.some(z => z.element === y) && y.contains(x.element) && !(x.element === y)));
+            items = items.filter(x => 
+                !(x.element.parentNode && 
+                x.element.parentNode.tagName === 'SPAN' && 
+                x.element.parentNode.children.length === 1 && 
+                x.element.parentNode.getAttribute('role') &&
+                items.some(y => y.element === x.element.parentNode)));
+
+            items = items.filter(x => !items.some(y => x.element.contains(y.element) && !(x == y)));
+
+            // textContent materializes the whole subtree, so only collect it for the items that survived the filters
+            for (const item of items) {
+                item.text = item.element.textContent.trim().replace(WS_RE, ' ');
+            }
+
+            // Level 1: only writes from here on, the overlay is built off-document and attached once at the end
+            const overlay = document.createDocumentFragment();
+            items.forEach(function(item, index) {
+                // Debugging output to check if element is processed
+                console.log("Processing item:", item.element);
+
+                if (markedElements.has(item.element)) return; // Skip already marked elements
+
+                // Floating borders are only for debug screenshots; without them we only write the mmid attributes
+                if (visualOverlay) item.rects.forEach((bbox) => {
+                    // Generate random color for floating borders
+                    var borderColor = getRandomColor(index);
+
+                    // Create the floating border element
+                    let newElement = document.createElement("div");
+                    newElement.style.outline = `2px dashed ${borderColor}`;
+                    newElement.style.position = "fixed";
+                    newElement.style.left = bbox.left + "px";
+                    newElement.style.top = bbox.top + "px";
+                    newElement.style.width = bbox.width + "px";
+                    newElement.style.height = bbox.height + "px";
+                    newElement.style.pointerEvents = "none";
+                    newElement.style.boxSizing = "border-box";
+                    newElement.style.zIndex = 2147483647;
+
+                    // Add floating label at the corner
+                    var label = document.createElement("span");
+                    label.textContent = index;
+                    label.style.position = "absolute";
+                    label.style.top = Math.max(-19, -bbox.top) + "px";
+                    label.style.left = Math.min(Math.floor(bbox.width / 5), 2) + "px";
+                    label.style.background = borderColor;
+                    label.style.color = "white";
+                    label.style.padding = "2px 4px";
+                    label.style.fontSize = "12px";
+                    label.style.borderRadius = "2px";
+                    newElement.appendChild(label);
+
+                    overlay.appendChild(newElement);
+                    labels.push(newElement);
+                });
+
+                // Inject mmid to the marked element, once regardless of how many rects it has
+                markElement(item.element);
+            });
+            if (labels.length > 0) {
+                document.body.appendChild(overlay);
+            }
+
+            return lastMmid;
+        }
+
+        // Function to generate random colors
+        function getRandomColor(index) {
+            var letters = '0123456789ABCDEF';
+            var color = '#';
+            for (var i = 0; i < 6; i++) {
+                color += letters[Math.floor(Math.random() * 16)];
+            }
+            return color;
+        }
+
+        // Initial invocation of markPage
+        markPage();
+        console.log("Initial mmid injection done, last mmid:", lastMmid);
+
+        // Only keep one observer per document, otherwise every DOM sync stacks another one with its own counter
+        if (window.__mmidObserver) {
+            window.__mmidObserver.disconnect();
+        }
+
+        // Added nodes are queued and marked during idle slices so that bursts of mutations don't stall the main thread
+        const pending = [];
+        let flushScheduled = false;
+        const scheduleIdle = window.requestIdleCallback
+            ? window.requestIdleCallback.bind(window)
+            : ((callback) => setTimeout(callback, 1));
+
+        function flushPending() {
+            flushScheduled = false;
+            for (const element of pending.splice(0)) {
+                if (markedElements.has(element) || !element.isConnected) continue;
+                markElement(element);
+            }
+        }
+
+        // Create MutationObserver instance to handle dynamically added elements
+        const observer = new MutationObserver((mutations) => {
+            for (const mutation of mutations) {
+                for (const node of mutation.addedNodes) {
+                    if (node.nodeType === Node.ELEMENT_NODE && node.matches(INTERACTIVE_SELECTOR)) {
+                        pending.push(node);
+                    }
+                }
+            }
+            if (pending.length > 0 && !flushScheduled) {
+                flushScheduled = true;
+                scheduleIdle(flushPending);
+            }
+        });
+
+        // Start observing DOM changes
+        observer.observe(document.body, { childList: true, subtree: true });
+        window.__mmidObserver = observer;
+        console.log("MutationObserver started");
+
+        return lastMmid;
+    };
+})();
+"""
+
+MMID_CLEANUP_JS = """
+(() => {
+    window.__mmidCleanup = function () {
+        const allElements = document.querySelectorAll('*[mmid]');
+        allElements.forEach(element => {
+            element.removeAttribute('aria-keyshortcuts');
+            const origAriaLabel = element.getAttribute('orig-aria-keyshortcuts');
+            if (origAriaLabel) {
+                element.setAttribute('aria-keyshortcuts', origAriaLabel);
+                element.removeAttribute('orig-aria-keyshortcuts');
+            }
+        });
+    };
+})();
+"""
+
+DOM_VERSION_JS = """
+(() => {
+    if (window.__domVersion) return;
+
+    // A fresh id per document, so versions of a reloaded page never match the ones of the previous document
+    const documentId = Math.random().toString(36).slice(2);
+    let version = 0;
+    const bump = () => { version++; };
+
+    // Anything that can change the accessibility tree or the set of visible elements bumps the version
+    new MutationObserver(bump).observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+    document.addEventListener('input', bump, true);
+    document.addEventListener('change', bump, true);
+    document.addEventListener('scroll', bump, { capture: true, passive: true });
+    window.addEventListener('resize', bump, { passive: true });
+
+    window.__domVersion = function () {
+        return `${documentId}:${version}`;
+    };
+})();
+"""
+
+PAGE_SCRIPTS = [
+    MMID_EXTRACT_JS,
+    MMID_INJECTOR_JS,
+    MMID_CLEANUP_JS,
+    DOM_VERSION_JS,
+]
+
+# The window functions PAGE_SCRIPTS define, all of them present means the scripts are installed on the document
+PAGE_HELPER_NAMES = [
+    "__mmidExtract",
+    "__injectMmids",
+    "__mmidCleanup",
+    "__domVersion",
+]
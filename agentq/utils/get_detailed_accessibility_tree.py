@@ -1,18 +1,76 @@
+import asyncio
+import copy
 import json
+import logging
 import os
 import re
+import sys
 import traceback
-from typing import Dict, List, Optional
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
 
-from playwright.async_api import Page
+from playwright.async_api import CDPSession, Page
+from playwright.async_api import Error as PlaywrightError
 from typing_extensions import Annotated, Any
 
+try:
+    import orjson
+except ImportError:  # only pinned in requirements.txt as a transitive dependency, not declared in pyproject
+    orjson = None
+
 from agentq.config.config import SOURCE_LOG_FOLDER_PATH
 from agentq.core.web_driver.playwright import PlaywrightManager
+from agentq.utils.dom_scripts import PAGE_HELPER_NAMES, PAGE_SCRIPTS
 from agentq.utils.logger import logger
 
 space_delimited_mmid = re.compile(r"^[\d ]+$")
 
+# Lookup tables used by __should_prune_node
+_PRUNE_ROLES = frozenset({"separator", "LineBreak"})
+_INPUT_TAGS = frozenset({"input", "button", "textarea"})
+_NAME_NOISE_CHARS = str.maketrans("", "", ",:\n")
+
+# JS condition that holds once every helper of PAGE_SCRIPTS is defined on the document
+_PAGE_HELPERS_INSTALLED = (
+    "["
+    + ", ".join(f"window.{name}" for name in PAGE_HELPER_NAMES)
+    + "].every(f => typeof f === 'function')"
+)
+
+# Accessibility node fields that window.__mmidExtract needs to dedupe the DOM attributes against
+_AX_DEDUP_FIELDS = ("name", "role", "description")
+
+# Enhanced trees of the last snapshots, keyed by (url, DOM version, only_input_fields, use_cdp_snapshot)
+_SNAPSHOT_CACHE_SIZE = 8
+_snapshot_cache: "OrderedDict[Tuple[str, str, bool, bool], Dict[str, Any]]" = OrderedDict()
+
+# One lock per page, dropped together with the page
+_page_locks: "weakref.WeakKeyDictionary[Page, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+# One CDP session per page for the accessibility snapshots, dropped together with the page
+_cdp_sessions: "weakref.WeakKeyDictionary[Page, CDPSession]" = weakref.WeakKeyDictionary()
+
+# How the raw CDP accessibility properties are surfaced, mirroring Playwright's accessibility.snapshot()
+_AX_STRING_PROPERTIES = ("keyshortcuts", "roledescription", "valuetext")
+_AX_BOOLEAN_PROPERTIES = (
+    "disabled",
+    "expanded",
+    "focused",
+    "modal",
+    "multiline",
+    "multiselectable",
+    "readonly",
+    "required",
+    "selected",
+)
+_AX_TRISTATE_PROPERTIES = ("checked", "pressed")
+_AX_NUMERICAL_PROPERTIES = ("level", "valuemax", "valuemin")
+_AX_TOKEN_PROPERTIES = ("autocomplete", "haspopup", "invalid", "orientation")
+_AX_TRISTATE_VALUES = {"true": True, "false": False, "mixed": "mixed"}
+# CDP roles that Playwright's snapshot reports under another name
+_AX_ROLE_NAMES = {"RootWebArea": "WebArea", "StaticText": "text"}
+
 
 def is_space_delimited_mmid(s: str) -> bool:
     """
@@ -24,8 +82,9 @@ def is_space_delimited_mmid(s: str) -> bool:
     Returns:
     - bool: True if the string matches the pattern, False otherwise.
     """
-    # Use fullmatch() to ensure the entire string matches the pattern
-    return bool(space_delimited_mmid.fullmatch(s))
+    # Reject the common non-mmid case (empty or starting with a non-digit) before running the regex,
+    # then use fullmatch() to ensure the entire string matches the pattern
+    return bool(s) and s[0].isdigit() and bool(space_delimited_mmid.fullmatch(s))
 
 # async def __inject_attributes(page: Page):
 #     """
@@ -392,193 +451,43 @@ def is_space_delimited_mmid(s: str) -> bool:
 
 
 #改过第二次的有框的
-async def __inject_attributes(page: Page):
+async def __inject_attributes(page: Page, visual_overlay: bool = False):
+    """
+    Injects mmid attributes into the interactive elements of the page.
+
+    Args:
+        page (Page): The page to inject the attributes into.
+        visual_overlay (bool): Whether to also draw the floating borders and index labels over the marked elements.
+            Only useful for debug screenshots, the accessibility tree only needs the mmid attributes.
+
+    Returns:
+        int: The last mmid that was assigned.
+    """
     try:
         await page.wait_for_load_state("domcontentloaded", timeout=10000)
     except TimeoutError:
-        print("DOM content loaded wait timed out, proceeding without waiting.")
+        logger.debug("DOM content loaded wait timed out, proceeding without waiting.")
 
+    # The injector itself is installed once per context (see agentq/utils/dom_scripts.py), only the call is sent here,
+    # together with the space key handler so that both take a single round-trip
     script = """
-    () => {
+    (visualOverlay) => {
         window.onkeydown = function(e) {
             if(e.keyCode == 32 && e.target.type != 'text' && e.target.type != 'textarea') {
                 e.preventDefault();
             }
         };
+        return window.__injectMmids(visualOverlay);
     }
     """
-    await page.evaluate(script)
-
-    result = await page.evaluate("""
-        () => {
-            let labels = [];
-            let markedElements = new Set(); // 用于存储已标记的元素，防止重复标记
-
-            function markPage() {
-                var bodyRect = document.body.getBoundingClientRect();
-
-                var items = Array.prototype.slice.call(
-                    document.querySelectorAll('*')
-                ).map(function(element) {
-                    var vw = Math.max(document.documentElement.clientWidth || 0, window.innerWidth || 0);
-                    var vh = Math.max(document.documentElement.clientHeight || 0, window.innerHeight || 0);
-
-                    var rects = [...element.getClientRects()].filter(bb => {
-                        var center_x = bb.left + bb.width / 2;
-                        var center_y = bb.top + bb.height / 2;
-                        var elAtCenter = document.elementFromPoint(center_x, center_y);
-
-                        return elAtCenter === element || element.contains(elAtCenter);
-                    }).map(bb => {
-                        const rect = {
-                            left: Math.max(0, bb.left),
-                            top: Math.max(0, bb.top),
-                            right: Math.min(vw, bb.right),
-                            bottom: Math.min(vh, bb.bottom)
-                        };
-                        return {
-                            ...rect,
-                            width: rect.right - rect.left,
-                            height: rect.bottom - rect.top
-                        }
-                    });
-
-                    var area = rects.reduce((acc, rect) => acc + rect.width * rect.height, 0);
-
-                    return {
-                        element: element,
-                        include: 
-                            (element.tagName === "INPUT" || element.tagName === "TEXTAREA" || element.tagName === "SELECT") ||
-                            (element.tagName === "BUTTON" || element.tagName === "A" || (element.onclick != null) || window.getComputedStyle(element).cursor == "pointer") ||
-                            (element.tagName === "IFRAME" || element.tagName === "VIDEO" || element.tagName === "LI" || element.tagName === "TD" || element.tagName === "OPTION"),
-                        area,
-                        rects,
-                        text: element.textContent.trim().replace(/\s{2,}/g, ' '),
-                        tagName: element.tagName,
-                        type: element.getAttribute("type") || '',
-                        ariaLabel: element.getAttribute("aria-label") || ''
-                    };
-                }).filter(item =>
-                    item.include && (item.area >= 20)
-                );
-
-                // Filter out unnecessary buttons and elements
-                const buttons = Array.from(document.querySelectorAll('button, a, input[type="button"], div[role="button"]'));
-                items = items.filter(x => !buttons.some(y => items.some(z => z.element === y) && y.contains(x.element) && !(x.element === y)));
-                items = items.filter(x => 
-                    !(x.element.parentNode && 
-                    x.element.parentNode.tagName === 'SPAN' && 
-                    x.element.parentNode.children.length === 1 && 
-                    x.element.parentNode.getAttribute('role') &&
-                    items.some(y => y.element === x.element.parentNode)));
-
-                items = items.filter(x => !items.some(y => x.element.contains(y.element) && !(x == y)));
-
-                let lastMmid = 0;
-                items.forEach(function(item, index) {
-                    // Debugging output to check if element is processed
-                    console.log("Processing item:", item.element);
-
-                    if (markedElements.has(item.element)) return; // Skip already marked elements
-
-                    item.rects.forEach((bbox) => {
-                        // Generate random color for floating borders
-                        var borderColor = getRandomColor(index);
-
-                        // Create the floating border element
-                        let newElement = document.createElement("div");
-                        newElement.style.outline = `2px dashed ${borderColor}`;
-                        newElement.style.position = "fixed";
-                        newElement.style.left = bbox.left + "px";
-                        newElement.style.top = bbox.top + "px";
-                        newElement.style.width = bbox.width + "px";
-                        newElement.style.height = bbox.height + "px";
-                        newElement.style.pointerEvents = "none";
-                        newElement.style.boxSizing = "border-box";
-                        newElement.style.zIndex = 2147483647;
-
-                        // Add floating label at the corner
-                        var label = document.createElement("span");
-                        label.textContent = index;
-                        label.style.position = "absolute";
-                        label.style.top = Math.max(-19, -bbox.top) + "px";
-                        label.style.left = Math.min(Math.floor(bbox.width / 5), 2) + "px";
-                        label.style.background = borderColor;
-                        label.style.color = "white";
-                        label.style.padding = "2px 4px";
-                        label.style.fontSize = "12px";
-                        label.style.borderRadius = "2px";
-                        newElement.appendChild(label);
-
-                        // Inject mmid to the marked elements
-                        const origAriaAttribute = item.element.getAttribute('aria-keyshortcuts');
-                        lastMmid++;
-                        item.element.setAttribute('mmid', lastMmid);
-                        item.element.setAttribute('aria-keyshortcuts', lastMmid);
-                        if (origAriaAttribute) {
-                            item.element.setAttribute('orig-aria-keyshortcuts', origAriaAttribute);
-                        }
-
-                        document.body.appendChild(newElement);
-                        labels.push(newElement);
-                    });
-
-                    // Mark the element to avoid duplication
-                    markedElements.add(item.element);
-                });
-
-                return lastMmid;
-            }
-
-            // Function to generate random colors
-            function getRandomColor(index) {
-                var letters = '0123456789ABCDEF';
-                var color = '#';
-                for (var i = 0; i < 6; i++) {
-                    color += letters[Math.floor(Math.random() * 16)];
-                }
-                return color;
-            }
-
-            // Initial invocation of markPage
-            const lastMmid = markPage();
-            console.log("Initial mmid injection done, last mmid:", lastMmid);
-
-            // Create MutationObserver instance to handle dynamically added elements
-            const observer = new MutationObserver((mutations) => {
-                const newElements = Array.from(mutations)
-                    .flatMap(mutation => Array.from(mutation.addedNodes))
-                    .filter(node => node.nodeType === Node.ELEMENT_NODE && node.matches('button, a[href], input, select, textarea, [contenteditable], [tabindex], [role="button"], [role="link"], [role="checkbox"], [role="menuitem"], [role="option"], [role="radio"], [role="switch"], [role="tab"], [role="treeitem"]'));
-
-                newElements.forEach(element => {
-                    // Check if element is already marked
-                    if (markedElements.has(element)) return;
-
-                    // Inject mmid if not marked yet
-                    const origAriaAttribute = element.getAttribute('aria-keyshortcuts');
-                    lastMmid++;
-                    element.setAttribute('mmid', lastMmid);
-                    element.setAttribute('aria-keyshortcuts', lastMmid);
-                    if (origAriaAttribute) {
-                        element.setAttribute('orig-aria-keyshortcuts', origAriaAttribute);
-                    }
-
-                    // Mark the element as processed
-                    markedElements.add(element);
-                });
-            });
-
-            // Start observing DOM changes
-            observer.observe(document.body, { childList: true, subtree: true });
-            console.log("MutationObserver started");
-
-            return lastMmid;
-        }
-    """)
+    result = await page.evaluate(script, visual_overlay)
 
-    print(
-        "Added MMID into elements dynamically and marked them with floating borders and labels"
-    )
+    if visual_overlay:
+        logger.debug(
+            "Added MMID into elements dynamically and marked them with floating borders and labels"
+        )
+    else:
+        logger.debug("Added MMID into elements dynamically")
     return result
 
 
@@ -633,8 +542,92 @@ async def __inject_attributes(page: Page):
 # print(f"Added MMID into elements dynamically")
 
 
+def __get_node_mmid(node: Dict[str, Any]) -> Optional[int]:
+    """
+    Reads the injected mmid from the 'keyshortcuts' of an accessibility node.
+    If the node carries multiple mmids, the last one is used.
+    """
+    mmid_temp: str = node.get("keyshortcuts")  # type: ignore
+    if mmid_temp and is_space_delimited_mmid(mmid_temp):
+        mmid_temp = mmid_temp.split(" ")[-1]
+
+    try:
+        return int(mmid_temp)
+    except (ValueError, TypeError):
+        return None
+
+
+def __walk_post_order(root: Dict[str, Any], visit: Callable[[Dict[str, Any]], Any]):
+    """
+    Calls `visit` on every node of the tree, children (in order) before their parent.
+    Uses an explicit stack so that deep accessibility trees don't pay for a Python frame per level.
+    """
+    stack: List[Tuple[Dict[str, Any], bool]] = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if children_done:
+            visit(node)
+        else:
+            stack.append((node, True))
+            for child in reversed(node.get("children", ())):
+                stack.append((child, False))
+
+
+def __collect_mmids(
+    node: Dict[str, Any],
+    mmids: List[int],
+    should_fetch_inner_text: List[bool],
+    ax_columns: Optional[Dict[str, List[Optional[str]]]] = None,
+):
+    """
+    Collects every mmid in the tree whose DOM attributes are needed, together with whether its 'innerText' is required,
+    so that all of them can be fetched from the page in a single round-trip.
+    If `ax_columns` is given, the accessibility fields the page-side dedup compares against are collected as well,
+    one list per field (None where the node lacks it), so the payload doesn't repeat the field names for every node.
+    The results are keyed by mmid on both sides, so the nodes are visited in plain stack order.
+    As this visits every node anyway, it also interns the roles of the tree.
+    """
+    stack: List[Dict[str, Any]] = [node]
+    while stack:
+        current = stack.pop()
+        # Only a few dozen distinct roles exist, share one string object per role across the whole tree
+        role = current.get("role")
+        if role is not None:
+            current["role"] = sys.intern(role)
+        mmid = __get_node_mmid(current)
+        if mmid and role != "menuitem":
+            mmids.append(mmid)
+            should_fetch_inner_text.append("children" not in current)
+            if ax_columns is not None:
+                for key, column in ax_columns.items():
+                    column.append(current.get(key))
+        stack.extend(current.get("children", ()))
+
+
+async def __ensure_page_scripts(page: Page) -> str:
+    """
+    Installs the DOM helper scripts on documents that were loaded before they were registered as context init scripts.
+
+    Returns:
+        str: The current DOM version of the page (see `window.__domVersion`), read in the same round-trip as the check.
+    """
+    dom_version = await page.evaluate(
+        f"() => {_PAGE_HELPERS_INSTALLED} ? window.__domVersion() : null"
+    )
+    if dom_version is None:
+        # The scripts don't depend on each other, let their evaluations pipeline on the connection
+        await asyncio.gather(*(page.evaluate(script) for script in PAGE_SCRIPTS))
+        dom_version = await page.evaluate("() => window.__domVersion()")
+    return dom_version
+
+
 async def __fetch_dom_info(
-    page: Page, accessibility_tree: Dict[str, Any], only_input_fields: bool
+    page: Page,
+    accessibility_tree: Dict[str, Any],
+    only_input_fields: bool,
+    *,
+    strict_tag_filter: bool = False,
+    cleanup_dom: bool = False,
 ):
     """
     Iterates over the accessibility tree, fetching additional information from the DOM based on 'mmid',
@@ -644,376 +637,40 @@ async def __fetch_dom_info(
         page (Page): The page object representing the web page.
         accessibility_tree (Dict[str, Any]): The accessibility tree JSON structure.
         only_input_fields (bool): Flag indicating whether to include only input fields in the new JSON structure.
+        strict_tag_filter (bool): If True, only keep elements with an interactive tag, an onclick link or a pointer cursor,
+            and delete the nodes whose element was filtered out. If False, only skip the non-content tags, add the
+            listbox / empty button details, and keep the nodes without DOM information as they are.
+        cleanup_dom (bool): If True, the page first restores its original 'aria-keyshortcuts' (see `__mmidCleanup`)
+            in the same evaluate call as the extraction.
 
     Returns:
         Dict[str, Any]: The pruned tree with detailed information from the DOM.
     """
-
     logger.debug("Reconciling the Accessibility Tree with the DOM")
-    # Define the attributes to fetch for each element
-    attributes = [
-        "name",
-        "aria-label",
-        "placeholder",
-        "mmid",
-        "id",
-        "for",
-        "data-testid",
-    ]
-    backup_attributes = []  # if the attributes are not found, then try to get these attributes
-    tags_to_ignore = [
-        "head",
-        "style",
-        "script",
-        "link",
-        "meta",
-        "noscript",
-        "template",
-        "iframe",
-        "g",
-        "main",
-        "c-wiz",
-        "svg",
-        "path",
-    ]
     attributes_to_delete = ["level", "multiline", "haspopup", "id", "for"]
-    ids_to_ignore = ["agentDriveAutoOverlay"]
-
-    # Recursive function to process each node in the accessibility tree
-    async def process_node(node: Dict[str, Any]):
-        if "children" in node:
-            for child in node["children"]:
-                await process_node(child)
-
-        # Use 'name' attribute from the accessibility node as 'mmid'
-        mmid_temp: str = node.get("keyshortcuts")  # type: ignore
-
-        # If the name has multiple mmids, take the last one
-        if mmid_temp and is_space_delimited_mmid(mmid_temp):
-            # TODO: consider if we should grab each of the mmids and process them separately as seperate nodes copying this node's attributes
-            mmid_temp = mmid_temp.split(" ")[-1]
-
-        # focusing on nodes with mmid, which is the attribute we inject
-        try:
-            mmid = int(mmid_temp)
-        except (ValueError, TypeError):
-            # logger.error(f"'name attribute contains \"{node.get('name')}\", which is not a valid numeric mmid. Adding node as is: {node}")
-            return node.get("name")
-
-        if node["role"] == "menuitem":
-            return node.get("name")
-
-        if node.get("role") == "dialog" and node.get("modal") == True:  # noqa: E712
-            node["important information"] = (
-                "This is a modal dialog. Please interact with this dialog and close it to be able to interact with the full page (e.g. by pressing the close button or selecting an option)."
-            )
-
-        if mmid:
-            # Determine if we need to fetch 'innerText' based on the absence of 'children' in the accessibility node
-            should_fetch_inner_text = "children" not in node
-
-            js_code = """
-            (input_params) => {
-                const should_fetch_inner_text = input_params.should_fetch_inner_text;
-                const mmid = input_params.mmid;
-                const attributes = input_params.attributes;
-                const tags_to_ignore = input_params.tags_to_ignore;
-                const ids_to_ignore = input_params.ids_to_ignore;
-
-                const element = document.querySelector(`[mmid="${mmid}"]`);
-
-                if (!element) {
-                    console.log(`No element found with mmid: ${mmid}`);
-                    return null;
-                }
-
-                if (ids_to_ignore.includes(element.id)) {
-                    console.log(`Ignoring element with id: ${element.id}`, element);
-                    return null;
-                }
-                //Ignore "option" because it would have been processed with the select element
-                if (tags_to_ignore.includes(element.tagName.toLowerCase()) || element.tagName.toLowerCase() === "option") return null;
-
-                let attributes_to_values = {
-                    'tag': element.tagName.toLowerCase() // Always include the tag name
-                };
-
-                // If the element is an input, include its type as well
-                if (element.tagName.toLowerCase() === 'input') {
-                    attributes_to_values['tag_type'] = element.type; // This will capture 'checkbox', 'radio', etc.
-                }
-                else if (element.tagName.toLowerCase() === 'select') {
-                    attributes_to_values["mmid"] = element.getAttribute('mmid');
-                    attributes_to_values["role"] = "combobox";
-                    attributes_to_values["options"] = [];
-
-                    for (const option of element.options) {
-                        let option_attributes_to_values = {
-                            "mmid": option.getAttribute('mmid'),
-                            "text": option.text,
-                            "value": option.value,
-                            "selected": option.selected
-                        };
-                        attributes_to_values["options"].push(option_attributes_to_values);
-                    }
-                    return attributes_to_values;
-                }
-
-                for (const attribute of attributes) {
-                    let value = element.getAttribute(attribute);
-
-                    if(value){
-                        /*
-                        if(attribute === 'href'){
-                            value = value.split('?')[0]
-                        }
-                        */
-                        attributes_to_values[attribute] = value;
-                    }
-                }
-
-                if (should_fetch_inner_text && element.innerText) {
-                    attributes_to_values['description'] = element.innerText;
-                }
-
-                let role = element.getAttribute('role');
-                if(role==='listbox' || element.tagName.toLowerCase()=== 'ul'){
-                    let children=element.children;
-                    let filtered_children = Array.from(children).filter(child => child.getAttribute('role') === 'option');
-                    console.log("Listbox or ul found: ", filtered_children);
-                    let attributes_to_include = ['mmid', 'role', 'aria-label','value'];
-                    attributes_to_values["additional_info"]=[]
-                    for (const child of children) {
-                        let children_attributes_to_values = {};
-
-                        for (let attr of child.attributes) {
-                            // If the attribute is not in the predefined list, add it to children_attributes_to_values
-                            if (attributes_to_include.includes(attr.name)) {
-                                children_attributes_to_values[attr.name] = attr.value;
-                            }
-                        }
-
-                        attributes_to_values["additional_info"].push(children_attributes_to_values);
-                    }
-                }
-                // Check if attributes_to_values contains more than just 'name', 'role', and 'mmid'
-                const keys = Object.keys(attributes_to_values);
-                const minimalKeys = ['tag', 'mmid'];
-                const hasMoreThanMinimalKeys = keys.length > minimalKeys.length || keys.some(key => !minimalKeys.includes(key));
-
-                if (!hasMoreThanMinimalKeys) {
-                    //If there were no attributes found, then try to get the backup attributes
-                    for (const backupAttribute of input_params.backup_attributes) {
-                        let value = element.getAttribute(backupAttribute);
-                        if(value){
-                            attributes_to_values[backupAttribute] = value;
-                        }
-                    }
-
-                    //if even the backup attributes are not found, then return null, which will cause this element to be skipped
-                    if(Object.keys(attributes_to_values).length <= minimalKeys.length) {
-                        if (element.tagName.toLowerCase() === 'button') {
-                                attributes_to_values["mmid"] = element.getAttribute('mmid');
-                                attributes_to_values["role"] = "button";
-                                attributes_to_values["additional_info"] = [];
-                                let children=element.children;
-                                let attributes_to_exclude = ['width', 'height', 'path', 'class', 'viewBox', 'mmid']
-
-                                // Check if the button has no text and no attributes
-                                if (element.innerText.trim() === '') {
-
-                                    for (const child of children) {
-                                        let children_attributes_to_values = {};
-
-                                        for (let attr of child.attributes) {
-                                            // If the attribute is not in the predefined list, add it to children_attributes_to_values
-                                            if (!attributes_to_exclude.includes(attr.name)) {
-                                                children_attributes_to_values[attr.name] = attr.value;
-                                            }
-                                        }
-
-                                        attributes_to_values["additional_info"].push(children_attributes_to_values);
-                                    }
-                                    console.log("Button with no text and no attributes: ", attributes_to_values);
-                                    return attributes_to_values;
-                                }
-                        }
-
-                        return null; // Return null if only minimal keys are present
-                    }
-                }
-                return attributes_to_values;
-            }
-            """
-
-            # Fetch attributes and possibly 'innerText' from the DOM element by 'mmid'
-            element_attributes = await page.evaluate(
-                js_code,
-                {
-                    "mmid": mmid,
-                    "attributes": attributes,
-                    "backup_attributes": backup_attributes,
-                    "should_fetch_inner_text": should_fetch_inner_text,
-                    "tags_to_ignore": tags_to_ignore,
-                    "ids_to_ignore": ids_to_ignore,
-                },
-            )
-
-            if "keyshortcuts" in node:
-                del node["keyshortcuts"]  # remove keyshortcuts since it is not needed
-
-            node["mmid"] = mmid
 
-            # Update the node with fetched information
-            if element_attributes:
-                node.update(element_attributes)
-
-                # check if 'name' and 'mmid' are the same
-                if (
-                    node.get("name") == node.get("mmid")
-                    and node.get("role") != "textbox"
-                ):
-                    del node["name"]  # Remove 'name' from the node
-
-                if (
-                    "name" in node
-                    and "description" in node
-                    and (
-                        node["name"] == node["description"]
-                        or node["name"] == node["description"].replace("\n", " ")
-                        or node["description"].replace("\n", "") in node["name"]
-                    )
-                ):
-                    del node[
-                        "description"
-                    ]  # if the name is same as description, then remove the description to avoid duplication
-
-                if (
-                    "name" in node
-                    and "aria-label" in node
-                    and node["aria-label"] in node["name"]
-                ):
-                    del node[
-                        "aria-label"
-                    ]  # if the name is same as the aria-label, then remove the aria-label to avoid duplication
-
-                if "name" in node and "text" in node and node["name"] == node["text"]:
-                    del node[
-                        "text"
-                    ]  # if the name is same as the text, then remove the text to avoid duplication
-
-                if (
-                    node.get("tag") == "select"
-                ):  # children are not needed for select menus since "options" attriburte is already added
-                    node.pop("children", None)
-                    node.pop("role", None)
-                    node.pop("description", None)
-
-                # role and tag can have the same info. Get rid of role if it is the same as tag
-                if node.get("role") == node.get("tag"):
-                    del node["role"]
-
-                # avoid duplicate aria-label
-                if (
-                    node.get("aria-label")
-                    and node.get("placeholder")
-                    and node.get("aria-label") == node.get("placeholder")
-                ):
-                    del node["aria-label"]
-
-                if node.get("role") == "link":
-                    del node["role"]
-                    if node.get("description"):
-                        node["text"] = node["description"]
-                        del node["description"]
-
-                # textbox just means a text input and that is expressed well enough with the rest of the attributes returned
-                # if node.get('role') == "textbox":
-                #    del node['role']
-
-                if node.get("role") == "textbox":
-                    # get the id attribute of this field from the DOM
-                    if "id" in element_attributes and element_attributes["id"]:
-                        # find if there is an element in the DOM that has this id in aria-labelledby.
-                        js_code = """
-                        (inputParams) => {
-                            let referencingElements = [];
-                            const referencedElement = document.querySelector(`[aria-labelledby="${inputParams.aria_labelled_by_query_value}"]`);
-                            if(referencedElement) {
-                                const mmid = referencedElement.getAttribute('mmid');
-                                if (mmid) {
-                                    return {"mmid": mmid, "tag": referencedElement.tagName.toLowerCase()};
-                                }
-                            }
-                            return null;
-                        }
-                        """
-                    # textbox just means a text input and that is expressed well enough with the rest of the attributes returned
-                    # del node['role']
-
-            # remove attributes that are not needed once processing of a node is complete
-            for attribute_to_delete in attributes_to_delete:
-                if attribute_to_delete in node:
-                    node.pop(attribute_to_delete, None)
-        else:
-            logger.debug(f"No element found with mmid: {mmid}, deleting node: {node}")
-            node["marked_for_deletion_by_mm"] = True
-
-    # Process each node in the tree starting from the root
-    await process_node(accessibility_tree)
-
-    pruned_tree = __prune_tree(accessibility_tree, only_input_fields)
-
-    logger.debug("Reconciliation complete")
-    return pruned_tree
-
-
-async def __fetch_dom_info(
-    page: Page, accessibility_tree: Dict[str, Any], only_input_fields: bool
-):
-    logger.debug("Reconciling the Accessibility Tree with the DOM")
-    # Define the attributes to fetch for each element
-    attributes = [
-        "name",
-        "aria-label",
-        "placeholder",
-        "mmid",
-        "id",
-        "for",
-        "data-testid",
-    ]
-    backup_attributes = []  # if the attributes are not found, then try to get these attributes
-    tags_to_ignore = [
-        "head",
-        "style",
-        "script",
-        "link",
-        "meta",
-        "noscript",
-        "template",
-        "iframe",
-        "g",
-        "main",
-        "c-wiz",
-        "svg",
-        "path",
-    ]
-    attributes_to_delete = ["level", "multiline", "haspopup", "id", "for"]
-    ids_to_ignore = ["agentDriveAutoOverlay"]
-
-    # Recursive function to process each node in the accessibility tree
-    async def process_node(node: Dict[str, Any]):
-        if "children" in node:
-            for child in node["children"]:
-                await process_node(child)
-
-        mmid_temp: str = node.get("keyshortcuts")  # type: ignore
-        if mmid_temp and is_space_delimited_mmid(mmid_temp):
-            mmid_temp = mmid_temp.split(" ")[-1]
+    mmids: List[int] = []
+    should_fetch_inner_text: List[bool] = []
+    ax_columns: Dict[str, List[Optional[str]]] = {key: [] for key in _AX_DEDUP_FIELDS}
+    __collect_mmids(accessibility_tree, mmids, should_fetch_inner_text, ax_columns)
+
+    # Fetch attributes and possibly 'innerText' for every mmid at once with the pre-installed extractor
+    rows: List[Dict[str, Any]] = await page.evaluate(
+        "(input_params) => window.__mmidExtract(input_params)",
+        {
+            "mmids": mmids,
+            "should_fetch_inner_text": should_fetch_inner_text,
+            "ax_columns": ax_columns,
+            "strict_tag_filter": strict_tag_filter,
+            "cleanup_dom": cleanup_dom,
+        },
+    )
+    attributes_by_mmid: Dict[int, Dict[str, Any]] = {row.pop("_mmid"): row for row in rows}
 
-        try:
-            mmid = int(mmid_temp)
-        except (ValueError, TypeError):
+    # Processes a single node of the accessibility tree, all DOM data is already at hand
+    def process_node(node: Dict[str, Any]):
+        mmid = __get_node_mmid(node)
+        if mmid is None:
             return node.get("name")
 
         if node["role"] == "menuitem":
@@ -1025,172 +682,38 @@ async def __fetch_dom_info(
             )
 
         if mmid:
-            should_fetch_inner_text = "children" not in node
-
-            js_code = """
-            (input_params) => {
-                const mmid = input_params.mmid;
-                const attributes = input_params.attributes;
-                const tags_to_ignore = input_params.tags_to_ignore;
-                const ids_to_ignore = input_params.ids_to_ignore;
-                const should_fetch_inner_text = input_params.should_fetch_inner_text;
-
-                const element = document.querySelector(`[mmid="${mmid}"]`);
-
-                if (!element) {
-                    console.log(`No element found with mmid: ${mmid}`);
-                    return null;
-                }
-
-                if (ids_to_ignore.includes(element.id)) {
-                    console.log(`Ignoring element with id: ${element.id}`, element);
-                    return null;
-                }
-
-                // Define valid tags based on the filtering conditions
-                const validTags = [
-                    "INPUT", "TEXTAREA", "SELECT", "BUTTON", "A", "IFRAME", "VIDEO", "LI", "TD", "OPTION"
-                ];
-
-                // Check if the element's tag is valid
-                if (!validTags.includes(element.tagName) && 
-                    !(element.tagName === "A" && element.onclick) &&
-                    !(window.getComputedStyle(element).cursor === "pointer")) {
-                    return null;  // If the element does not match the filtering conditions, skip it
-                }
-
-                let attributes_to_values = {
-                    'tag': element.tagName.toLowerCase() // Always include the tag name
-                };
-
-                if (element.tagName.toLowerCase() === 'input') {
-                    attributes_to_values['tag_type'] = element.type;
-                }
-                else if (element.tagName.toLowerCase() === 'select') {
-                    attributes_to_values["mmid"] = element.getAttribute('mmid');
-                    attributes_to_values["role"] = "combobox";
-                    attributes_to_values["options"] = [];
-
-                    for (const option of element.options) {
-                        let option_attributes_to_values = {
-                            "mmid": option.getAttribute('mmid'),
-                            "text": option.text,
-                            "value": option.value,
-                            "selected": option.selected
-                        };
-                        attributes_to_values["options"].push(option_attributes_to_values);
-                    }
-                    return attributes_to_values;
-                }
-
-                for (const attribute of attributes) {
-                    let value = element.getAttribute(attribute);
-
-                    if(value){
-                        attributes_to_values[attribute] = value;
-                    }
-                }
-
-                if (should_fetch_inner_text && element.innerText) {
-                    attributes_to_values['description'] = element.innerText;
-                }
-
-                // Only return attributes if mmid is present
-                if (attributes_to_values["mmid"]) {
-                    return attributes_to_values;
-                }
-
-                return null;  // Skip if no mmid found
-            }
-            """
-
-            # Fetch attributes and possibly 'innerText' from the DOM element by 'mmid'
-            element_attributes = await page.evaluate(
-                js_code,
-                {
-                    "mmid": mmid,
-                    "attributes": attributes,
-                    "backup_attributes": backup_attributes,
-                    "should_fetch_inner_text": should_fetch_inner_text,
-                    "tags_to_ignore": tags_to_ignore,
-                    "ids_to_ignore": ids_to_ignore,
-                },
-            )
+            element_attributes = attributes_by_mmid.get(mmid)
 
             if "keyshortcuts" in node:
-                del node["keyshortcuts"]
+                del node["keyshortcuts"]  # remove keyshortcuts since it is not needed
 
             node["mmid"] = mmid
 
             if element_attributes:
-                node.update(element_attributes)
+                # element that this field labels through aria-labelledby, only kept for textboxes below
+                labelled_element = element_attributes.pop("_labelled_element", None)
 
-                if (
-                    node.get("name") == node.get("mmid")
-                    and node.get("role") != "textbox"
-                ):
-                    del node["name"]
-
-                if (
-                    "name" in node
-                    and "description" in node
-                    and (
-                        node["name"] == node["description"]
-                        or node["name"] == node["description"].replace("\n", " ")
-                    )
-                ):
-                    del node["description"]
-
-                if (
-                    "name" in node
-                    and "aria-label" in node
-                    and node["aria-label"] in node["name"]
-                ):
-                    del node["aria-label"]
-
-                if node.get("tag") == "select":
-                    node.pop("children", None)
-                    node.pop("role", None)
-                    node.pop("description", None)
-
-                if node.get("role") == node.get("tag"):
-                    del node["role"]
+                # the attributes come already deduplicated from the page, only the accessibility fields it flagged are left to drop
+                for key in element_attributes.pop("_drop", ()):
+                    node.pop(key, None)
+                node.update(element_attributes)
 
-                if (
-                    node.get("aria-label")
-                    and node.get("placeholder")
-                    and node.get("aria-label") == node.get("placeholder")
-                ):
-                    del node["aria-label"]
-
-                if node.get("role") == "link":
-                    del node["role"]
-                    if node.get("description"):
-                        node["text"] = node["description"]
-                        del node["description"]
-
-                if node.get("role") == "textbox":
-                    if "id" in element_attributes and element_attributes["id"]:
-                        js_code = """
-                        (inputParams) => {
-                            let referencingElements = [];
-                            const referencedElement = document.querySelector(`[aria-labelledby="${inputParams.aria_labelled_by_query_value}"]`);
-                            if(referencedElement) {
-                                const mmid = referencedElement.getAttribute('mmid');
-                                if (mmid) {
-                                    return {"mmid": mmid, "tag": referencedElement.tagName.toLowerCase()};
-                                }
-                            }
-                            return null;
-                        }
-                        """
-            else:
+                if node.get("role") == "textbox" and labelled_element:
+                    # another element in the DOM has this field's id in aria-labelledby
+                    node["labels"] = labelled_element
+            elif strict_tag_filter:
                 logger.debug(
                     f"No element found with mmid: {mmid}, deleting node: {node}"
                 )
                 node["marked_for_deletion_by_mm"] = True
 
-    await process_node(accessibility_tree)
+            if not strict_tag_filter:
+                # remove attributes that are not needed once processing of a node is complete
+                for attribute_to_delete in attributes_to_delete:
+                    node.pop(attribute_to_delete, None)
+
+    # Process each node in the tree, children before their parent
+    __walk_post_order(accessibility_tree, process_node)
 
     pruned_tree = __prune_tree(accessibility_tree, only_input_fields)
 
@@ -1198,31 +721,11 @@ async def __fetch_dom_info(
     return pruned_tree
 
 
-async def __cleanup_dom(page: Page):
-    """
-    Cleans up the DOM by removing injected 'aria-description' attributes and restoring any original 'aria-keyshortcuts'
-    from 'orig-aria-keyshortcuts'.
-    """
-    logger.debug("Cleaning up the DOM's previous injections")
-    await page.evaluate("""() => {
-        const allElements = document.querySelectorAll('*[mmid]');
-        allElements.forEach(element => {
-            element.removeAttribute('aria-keyshortcuts');
-            const origAriaLabel = element.getAttribute('orig-aria-keyshortcuts');
-            if (origAriaLabel) {
-                element.setAttribute('aria-keyshortcuts', origAriaLabel);
-                element.removeAttribute('orig-aria-keyshortcuts');
-            }
-        });
-    }""")
-    logger.debug("DOM cleanup complete")
-
-
 def __prune_tree(
     node: Dict[str, Any], only_input_fields: bool
 ) -> Optional[Dict[str, Any]]:
     """
-    Recursively prunes a tree starting from `node`, based on pruning conditions and handling of 'unraveling'.
+    Prunes a tree starting from `node`, based on pruning conditions and handling of 'unraveling'.
 
     The function has two main jobs:
     1. Pruning: Remove nodes that don't meet certain conditions, like being marked for deletion.
@@ -1233,8 +736,8 @@ def __prune_tree(
     be cautious about modifying the tree outside this function during a prune operation.
 
     Args:
-    - node (Dict[str, Any]): The node we're currently looking at. We'll check this node, its children,
-      and so on, recursively down the tree.
+    - node (Dict[str, Any]): The root of the tree to prune. We'll check this node, its children,
+      and so on, down the tree.
     - only_input_fields (bool): If True, we're only interested in pruning input-related nodes (like form fields).
       This lets you narrow the focus if, for example, you're only interested in cleaning up form-related parts
       of a larger tree.
@@ -1247,48 +750,54 @@ def __prune_tree(
     Notes:
     - 'marked_for_deletion_by_mm' is our flag for nodes that should definitely be removed.
     - Unraveling is neat for flattening the tree when a node is just a wrapper without semantic meaning.
-    - We use a while loop with manual index management to safely modify the list of children as we iterate over it.
+      The lifted children are kept as they are, they are not pruned themselves.
+    - The walk is an explicit post-order stack, so every node's children are settled (and judged by
+      `__should_prune_node` exactly once) before the node itself. Each children list is rebuilt in a single
+      pass, which keeps the whole prune linear in the size of the tree.
     """
     if "marked_for_deletion_by_mm" in node:
         return None
 
-    if "children" in node:
-        i = 0
-        while i < len(node["children"]):
-            child = node["children"][i]
-            if "marked_for_unravel_children" in child:
-                # Replace the current child with its children
-                if "children" in child:
-                    node["children"] = (
-                        node["children"][:i]
-                        + child["children"]
-                        + node["children"][i + 1 :]
-                    )
-                    i += (
-                        len(child["children"]) - 1
-                    )  # Adjust the index for the new children
-                else:
-                    # If the node marked for unraveling has no children, remove it
-                    node["children"].pop(i)
-                    i -= 1  # Adjust the index since we removed an element
+    pruned_ids = set()  # id() of the nodes that __should_prune_node rejected
+    stack: List[Tuple[Dict[str, Any], bool]] = [(node, False)]
+    while stack:
+        current, children_done = stack.pop()
+        children = current.get("children")
+
+        if not children_done:
+            stack.append((current, True))
+            if children:
+                for child in children:
+                    # Deleted nodes are dropped and unravelled ones are spliced as is, neither needs a visit
+                    if not (
+                        "marked_for_deletion_by_mm" in child
+                        or "marked_for_unravel_children" in child
+                    ):
+                        stack.append((child, False))
+            continue
+
+        if children is not None:
+            kept_children = []
+            for child in children:
+                if "marked_for_unravel_children" in child:
+                    # Replace the child with its children; if it has none it simply disappears
+                    kept_children.extend(child.get("children", ()))
+                elif not (
+                    "marked_for_deletion_by_mm" in child or id(child) in pruned_ids
+                ):
+                    kept_children.append(child)
+
+            # After processing all children, if the children array is empty, remove it
+            if kept_children:
+                current["children"] = kept_children
             else:
-                # Recursively prune the child if it's not marked for unraveling
-                pruned_child = __prune_tree(child, only_input_fields)
-                if pruned_child is None:
-                    # If the child is pruned, remove it from the children list
-                    node["children"].pop(i)
-                    i -= 1  # Adjust the index since we removed an element
-                else:
-                    # Update the child with the pruned version
-                    node["children"][i] = pruned_child
-            i += 1  # Move to the next child
+                del current["children"]
 
-        # After processing all children, if the children array is empty, remove it
-        if not node["children"]:
-            del node["children"]
+        # Apply existing conditions to decide if the current node should be pruned
+        if __should_prune_node(current, only_input_fields):
+            pruned_ids.add(id(current))
 
-    # Apply existing conditions to decide if the current node should be pruned
-    return None if __should_prune_node(node, only_input_fields) else node
+    return None if id(node) in pruned_ids else node
 
 
 def __should_prune_node(node: Dict[str, Any], only_input_fields: bool):
@@ -1302,44 +811,32 @@ def __should_prune_node(node: Dict[str, Any], only_input_fields: bool):
     Returns:
         bool: True if the node should be pruned, False otherwise.
     """
+    role = node.get("role")
+
+    # Cheap role checks first, they decide most nodes without touching the name
+    if role in _PRUNE_ROLES:
+        return True
+
     # If the request is for only input fields and this is not an input field, then mark the node for prunning
     if (
-        node.get("role") != "WebArea"
-        and only_input_fields
-        and not (
-            node.get("tag") in ("input", "button", "textarea")
-            or node.get("role") == "button"
-        )
+        only_input_fields
+        and role != "WebArea"
+        and not (node.get("tag") in _INPUT_TAGS or role == "button")
     ):
         return True
 
     if (
-        node.get("role") == "generic"
-        and "children" not in node
-        and not ("name" in node and node.get("name"))
+        role == "generic" and "children" not in node and not node.get("name")
     ):  # The presence of 'children' is checked after potentially deleting it above
         return True
 
-    if node.get("role") in ["separator", "LineBreak"]:
-        return True
-    processed_name = ""
-    if "name" in node:
-        processed_name: str = node.get("name")  # type: ignore
-        processed_name = processed_name.replace(",", "")
-        processed_name = processed_name.replace(":", "")
-        processed_name = processed_name.replace("\n", "")
-        processed_name = processed_name.strip()
-        if len(processed_name) < 3:
-            processed_name = ""
-
     # check if the node only have name and role, then delete that node
-    if (
-        len(node) == 2
-        and "name" in node
-        and "role" in node
-        and not (node.get("role") == "text" and processed_name != "")
-    ):
-        return True
+    if len(node) == 2 and "name" in node and "role" in node:
+        if role != "text":
+            return True
+        # text nodes are kept only if their name still says something once the punctuation is stripped
+        processed_name: str = node["name"].translate(_NAME_NOISE_CHARS).strip()
+        return len(processed_name) < 3
     return False
 
 
@@ -1397,7 +894,143 @@ async def get_dom_with_accessibility_info() -> (
     return await do_get_accessibility_info(page)
 
 
-async def do_get_accessibility_info(page: Page, only_input_fields: bool = False):
+def __dump_debug(file_name: str, obj: Any):
+    """
+    Writes a JSON dump to the source log folder, only when the logger is enabled for DEBUG.
+
+    Args:
+        file_name (str): The name of the file inside SOURCE_LOG_FOLDER_PATH.
+        obj (Any): The JSON serializable object to dump.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
+    path = os.path.join(SOURCE_LOG_FOLDER_PATH, file_name)
+    if orjson is not None:
+        # orjson encodes natively and straight to UTF-8 bytes, several times faster than json on these trees
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, "w", encoding="utf-8", buffering=1 << 20) as f:
+            # json.dump encodes chunk by chunk into the file, the whole document never sits in memory as one string
+            json.dump(obj, f, indent=2)
+    logger.debug(f"{file_name} saved")
+
+
+def __serialize_cdp_ax_node(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts a raw CDP AXNode into the dict shape of a Playwright accessibility snapshot node (without children).
+    Ignored nodes are kept like Playwright keeps them, as a bare {role, name} wrapper with an empty name.
+    """
+    properties = {
+        prop["name"].lower(): prop.get("value", {}).get("value")
+        for prop in payload.get("properties", ())
+    }
+    description = payload.get("description")
+    if description:
+        properties["description"] = description.get("value")
+
+    role = payload.get("role", {}).get("value") or "Unknown"
+    name = payload.get("name")
+    node: Dict[str, Any] = {
+        "role": sys.intern(_AX_ROLE_NAMES.get(role, role)),
+        "name": (name.get("value") or "") if name else "",
+    }
+    if payload.get("ignored"):
+        node["name"] = ""
+        return node
+    value = payload.get("value")
+    if value and "value" in value:
+        node["value"] = value["value"]
+    if "description" in properties:
+        node["description"] = properties["description"]
+    for key in _AX_STRING_PROPERTIES:
+        if key in properties:
+            node[key] = properties[key]
+    for key in _AX_BOOLEAN_PROPERTIES:
+        if properties.get(key):
+            node[key] = properties[key]
+    for key in _AX_TRISTATE_PROPERTIES:
+        if key in properties:
+            node[key] = _AX_TRISTATE_VALUES.get(str(properties[key]).lower(), False)
+    for key in _AX_NUMERICAL_PROPERTIES:
+        if key in properties:
+            node[key] = properties[key]
+    for key in _AX_TOKEN_PROPERTIES:
+        if properties.get(key) and properties[key] != "false":
+            node[key] = properties[key]
+    return node
+
+
+async def __cdp_accessibility_snapshot(page: Page) -> Optional[Dict[str, Any]]:
+    """
+    Takes the full accessibility tree of the page straight from CDP (Accessibility.getFullAXTree),
+    skipping the tree rebuilding Playwright does in accessibility.snapshot().
+    The CDP session is opened once per page and reused by the following snapshots.
+
+    Args:
+        page (Page): The page to take the snapshot of.
+
+    Returns:
+        Optional[Dict[str, Any]]: The root node in the same shape as page.accessibility.snapshot(interesting_only=False),
+            or None if the page has no accessibility tree.
+    """
+    try:
+        result = await (await __cdp_session(page)).send("Accessibility.getFullAXTree")
+    except PlaywrightError:
+        # The cached session was detached (e.g. the renderer was swapped), retry once on a fresh one
+        _cdp_sessions.pop(page, None)
+        result = await (await __cdp_session(page)).send("Accessibility.getFullAXTree")
+
+    payloads = result.get("nodes", [])
+    if not payloads:
+        return None
+    by_id: Dict[str, Dict[str, Any]] = {payload["nodeId"]: payload for payload in payloads}
+
+    root = __serialize_cdp_ax_node(payloads[0])
+    # Each entry is (child ids still to place, the serialized node they go under)
+    stack: List[Tuple[List[str], Dict[str, Any]]] = [
+        (list(reversed(payloads[0].get("childIds", ()))), root)
+    ]
+    while stack:
+        child_ids, parent = stack[-1]
+        if not child_ids:
+            stack.pop()
+            continue
+        payload = by_id.get(child_ids.pop())
+        if payload is None:
+            continue
+        node = __serialize_cdp_ax_node(payload)
+        parent.setdefault("children", []).append(node)
+        stack.append((list(reversed(payload.get("childIds", ()))), node))
+    return root
+
+
+async def __cdp_session(page: Page) -> CDPSession:
+    """
+    Returns the CDP session of `page`, opening it on first use. It is detached together with the page.
+    """
+    session = _cdp_sessions.get(page)
+    if session is None:
+        session = _cdp_sessions[page] = await page.context.new_cdp_session(page)
+    return session
+
+
+def __page_lock(page: Page) -> asyncio.Lock:
+    """
+    Returns the lock serializing the accessibility pipeline on `page`, creating it on first use.
+    """
+    lock = _page_locks.get(page)
+    if lock is None:
+        lock = _page_locks[page] = asyncio.Lock()
+    return lock
+
+
+async def do_get_accessibility_info(
+    page: Page,
+    only_input_fields: bool = False,
+    use_cdp_snapshot: bool = False,
+):
     """
     Retrieves the accessibility information of a web page and saves it as JSON files.
 
@@ -1405,41 +1038,71 @@ async def do_get_accessibility_info(page: Page, only_input_fields: bool = False)
         page (Page): The page object representing the web page.
         only_input_fields (bool, optional): If True, only retrieves accessibility information for input fields.
             Defaults to False.
+        use_cdp_snapshot (bool, optional): If True, takes the full accessibility tree straight from CDP instead of
+            page.accessibility.snapshot(), which is faster on large pages. Chromium only. Defaults to False.
 
     Returns:
         Dict[str, Any] or None: The enhanced accessibility tree as a dictionary, or None if an error occurred.
     """
+    # Concurrent calls on the same page would interleave their mmid injection, snapshot and cleanup;
+    # run them one at a time, the later ones then usually hit the snapshot cache
+    async with __page_lock(page):
+        return await __get_accessibility_info(
+            page, only_input_fields, use_cdp_snapshot
+        )
+
+
+async def __get_accessibility_info(
+    page: Page,
+    only_input_fields: bool,
+    use_cdp_snapshot: bool,
+) -> Optional[Dict[str, Any]]:
+    """
+    The body of `do_get_accessibility_info`, to be called with the page's lock held.
+    """
+    dom_version = await __ensure_page_scripts(page)
+
+    # Nothing changed on the page since the last snapshot, skip the whole snapshot and enrichment pipeline
+    cache_key = (page.url, dom_version, only_input_fields, use_cdp_snapshot)
+    cached_tree = _snapshot_cache.get(cache_key)
+    if cached_tree is not None:
+        _snapshot_cache.move_to_end(cache_key)
+        logger.debug(
+            "DOM unchanged since the last snapshot, reusing the enhanced accessibility tree"
+        )
+        return copy.deepcopy(cached_tree)
+
     result = await __inject_attributes(page)
-    print(f"__inject_attributes:{result}")
-    accessibility_tree: Dict[str, Any] = await page.accessibility.snapshot(
-        interesting_only=False
-    )  # type: ignore
-
-    with open(
-        os.path.join(SOURCE_LOG_FOLDER_PATH, "json_accessibility_dom.json"),
-        "w",
-        encoding="utf-8",
-    ) as f:
-        f.write(json.dumps(accessibility_tree, indent=2))
-        logger.debug("json_accessibility_dom.json saved")
-
-    await __cleanup_dom(page)
+    logger.debug(f"__inject_attributes: {result}")
+    accessibility_tree: Dict[str, Any]
+    if use_cdp_snapshot:
+        accessibility_tree = await __cdp_accessibility_snapshot(page)  # type: ignore
+    else:
+        accessibility_tree = await page.accessibility.snapshot(
+            interesting_only=False
+        )  # type: ignore
+
+    __dump_debug("json_accessibility_dom.json", accessibility_tree)
+
     try:
         enhanced_tree = await __fetch_dom_info(
-            page, accessibility_tree, only_input_fields
+            page,
+            accessibility_tree,
+            only_input_fields,
+            strict_tag_filter=True,
+            cleanup_dom=True,
         )
 
         logger.debug("Enhanced Accessibility Tree ready")
 
-        with open(
-            os.path.join(
-                SOURCE_LOG_FOLDER_PATH, "json_accessibility_dom_enriched.json"
-            ),
-            "w",
-            encoding="utf-8",
-        ) as f:
-            f.write(json.dumps(enhanced_tree, indent=2))
-            logger.debug("json_accessibility_dom_enriched.json saved")
+        __dump_debug("json_accessibility_dom_enriched.json", enhanced_tree)
+
+        # Keyed by the version after our own mmid injection and cleanup, which also count as mutations
+        dom_version = await page.evaluate("() => window.__domVersion()")
+        cache_key = (page.url, dom_version, only_input_fields, use_cdp_snapshot)
+        _snapshot_cache[cache_key] = copy.deepcopy(enhanced_tree)
+        if len(_snapshot_cache) > _SNAPSHOT_CACHE_SIZE:
+            _snapshot_cache.popitem(last=False)
 
         return enhanced_tree
     except Exception as e:
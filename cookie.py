@@ -1,51 +1,99 @@
-from playwright.sync_api import Playwright, sync_playwright, expect
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import Browser, Playwright, async_playwright, expect
 import os
 
-def run(playwright: Playwright) -> None:
-    # 使用本地Chrome浏览器
-    browser = playwright.chromium.launch(
-        headless=False,
-        executable_path=r"C:\Program Files\Google\Chrome\Application\chrome.exe",
-        slow_mo=100  # 减慢操作速度方便观察
-    )
-    
-    # 创建新的上下文
-    context = browser.new_context(
-        viewport={'width': 1920, 'height': 1080}  # 设置窗口大小
+LOGIN_STATE_PATH = "auth/login_state.json"
+
+# 需要保存登录状态的账号: (用户名, 密码, 登录状态保存路径)
+CREDENTIALS: List[Tuple[str, str, str]] = [
+    ("tester", "tester", LOGIN_STATE_PATH),
+]
+
+def save_state_if_changed(state: Dict[str, Any], out_path: str) -> bool:
+    # 登录状态没有变化时不重写文件；哈希记录在旁边的 .hash 文件中，比较时无需读取整个状态文件
+    data = json.dumps(state, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    digest = hashlib.blake2b(data).hexdigest()
+    hash_path = out_path + ".hash"
+    if os.path.exists(out_path) and os.path.exists(hash_path):
+        with open(hash_path, "r", encoding="utf-8") as f:
+            if f.read().strip() == digest:
+                return False
+
+    # 先写临时文件再原子替换，读取方不会看到写了一半的文件
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, out_path)
+    with open(hash_path, "w", encoding="utf-8") as f:
+        f.write(digest)
+    return True
+
+async def capture(browser: Browser, username: str, password: str, out_path: str) -> None:
+    # 每个账号使用同一浏览器中的独立上下文，已有登录状态时直接复用
+    context = await browser.new_context(
+        viewport={'width': 1920, 'height': 1080},  # 设置窗口大小
+        storage_state=out_path if os.path.exists(out_path) else None,
     )
-    page = context.new_page()
+    page = await context.new_page()
     
     try:
         # 访问目标网站
-        page.goto("https://www.ryanair.com", wait_until="networkidle", timeout=30000)
+        # DOM就绪即可，页面是否可用由下面的显式等待判断，不再等待网络空闲
+        await page.goto("https://www.ryanair.com", wait_until="domcontentloaded", timeout=30000)
         
-        # 登录操作，增加等待时间
-        page.wait_for_selector("input[placeholder='用户名: tester']", timeout=10000)
-        page.get_by_placeholder("用户名: tester").click()
-        page.get_by_placeholder("用户名: tester").fill("tester")
-        page.get_by_placeholder("密码: tester").fill("tester")
-        page.get_by_role("button", name="登 录").click()
+        # 等待登录框或工作台出现；复用的登录状态仍有效时会直接进入工作台
+        await page.wait_for_selector("input[placeholder='用户名: tester'], [title='工作台']", timeout=10000)
+        if await page.get_by_title("工作台").count() == 0:
+            # 登录操作
+            await page.get_by_placeholder("用户名: tester").click()
+            await page.get_by_placeholder("用户名: tester").fill(username)
+            await page.get_by_placeholder("密码: tester").fill(password)
+            await page.get_by_role("button", name="登 录").click()
         
         # 等待登录成功并验证
-        page.wait_for_selector("[title='工作台']", timeout=10000)
-        expect(page.get_by_title("工作台")).to_be_visible()
+        await page.wait_for_selector("[title='工作台']", timeout=10000)
+        await expect(page.get_by_title("工作台")).to_be_visible()
         
-        # 创建保存目录
-        os.makedirs("auth", exist_ok=True)
-        
-        # 保存登录状态
-        storage = context.storage_state(path="auth/login_state.json")
-        print("登录状态已保存到 auth/login_state.json")
+        # 保存登录状态，仅在发生变化时写入
+        storage = await context.storage_state()
+        if save_state_if_changed(storage, out_path):
+            print(f"{username} 的登录状态已保存到 {out_path}")
+        else:
+            print(f"{username} 的登录状态未变化，保留 {out_path}")
         
     except Exception as e:
-        print(f"发生错误: {str(e)}")
+        print(f"{username} 发生错误: {str(e)}")
         # 出错时截图
-        page.screenshot(path="error_screenshot.png")
+        await page.screenshot(path=f"error_screenshot_{username}.png")
         
     finally:
-        context.close()
-        browser.close()
+        await context.close()
+
+async def run(playwright: Playwright, browser: Optional[Browser] = None) -> None:
+    # 传入已启动的浏览器时直接复用，只为每个账号新建上下文
+    owns_browser = browser is None
+    if owns_browser:
+        # 使用本地安装的Chrome浏览器，不再写死安装路径，也不再减慢操作速度
+        browser = await playwright.chromium.launch(headless=True, channel="chrome")
+    
+    try:
+        # 所有账号并发登录，网络等待互相重叠
+        await asyncio.gather(
+            *[capture(browser, username, password, out_path) for username, password, out_path in CREDENTIALS]
+        )
+    finally:
+        # 复用的浏览器由调用方负责关闭
+        if owns_browser:
+            await browser.close()
+
+async def main() -> None:
+    async with async_playwright() as playwright:
+        await run(playwright)
 
 if __name__ == "__main__":
-    with sync_playwright() as playwright:
-        run(playwright)
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
@@ -3,9 +3,15 @@ import asyncio
 from playwright.async_api import Page
 from agentq.core.web_driver.playwright import PlaywrightManager
 import asyncio
+import atexit
 import json
+import logging
+import os
+import shutil
+import subprocess
 import sys
-from typing import List, Tuple
+import weakref
+from typing import List, Optional, Tuple
 
 import numpy as np
 from langsmith import traceable
@@ -52,6 +58,22 @@ MAGENTA = "\033[95m"
 CYAN = "\033[96m"
 RESET = "\033[0m"
 
+log = logging.getLogger(__name__)
+
+
+class ColorFormatter(logging.Formatter):
+    # 颜色通过 extra={"color": ...} 传入，只有输出到终端时才加上 ANSI 码
+    def __init__(self, use_color: bool):
+        super().__init__("%(message)s")
+        self.use_color = use_color
+
+    def format(self, record):
+        message = super().format(record)
+        color = getattr(record, "color", None)
+        if self.use_color and color:
+            return f"{color}{message}{RESET}"
+        return message
+
 
 @traceable(run_type="chain", name="mcts")
 class BrowserWorldModel(WorldModel[BrowserState, BrowserAction, str]):
@@ -214,8 +236,9 @@ class BrowserMCTSSearchConfig(SearchConfig[BrowserState, BrowserAction, str]):
         self, state: BrowserState, tasks: List[TaskWithActions]
     ) -> List[BrowserAction]:
         ranked_actions = []
-        remaining_tasks = tasks.copy()
-        total_tasks = len(remaining_tasks)
+        # 按 id 索引剩余任务，每轮只删除一个，不必重建整个列表
+        remaining_tasks = {task.id: task for task in tasks}
+        total_tasks = len(tasks)
 
         print(f"{GREEN}[INFO] Sorting task via Critic now...")
         for iteration in range(total_tasks):
@@ -225,7 +248,7 @@ class BrowserMCTSSearchConfig(SearchConfig[BrowserState, BrowserAction, str]):
             critic_input = AgentQCriticInput(
                 objective=state.objective,
                 completed_tasks=state.completed_tasks,
-                tasks_for_eval=remaining_tasks,
+                tasks_for_eval=list(remaining_tasks.values()),
                 current_page_url=state.url,
                 current_page_dom=state.dom,
             )
@@ -240,9 +263,7 @@ class BrowserMCTSSearchConfig(SearchConfig[BrowserState, BrowserAction, str]):
                 )
 
                 # Remove the top task from remaining tasks
-                remaining_tasks = [
-                    task for task in remaining_tasks if task.id != top_task.id
-                ]
+                remaining_tasks.pop(top_task.id, None)
             else:
                 print(
                     f"{MAGENTA}[DEBUG] Warning: No valid top task found in iteration {iteration}. Skipping.{RESET}"
@@ -434,7 +455,7 @@ async def wait_for_navigation(max_retries=3):
 
 
 async def main(objective: str = None, eval_mode: bool = False):
-    print(f"{BLUE}Starting MCTS{RESET}")
+    log.info("Starting MCTS", extra={"color": BLUE})
     playwright_manager = PlaywrightManager()
 
     # 初始化 PlaywrightManager
@@ -444,20 +465,31 @@ async def main(objective: str = None, eval_mode: bool = False):
         await playwright_manager.async_initialize(
             eval_mode=eval_mode, homepage="http://localhost:3000/abc"
         )
-    dom = await get_dom_with_content_type(content_type="all_fields")
-    # print(f"{CYAN}[DEBUG] Got current DOM (length: {len(dom)}){RESET}")
-    print(str(dom))
-
-    # 获取当前页面对象
-    page: Page = await playwright_manager.get_current_page()
-    screenshot,img_path= await get_screenshot()
-    print(f'screenshot:{screenshot}')
-    # await highlight_interactive_elements(page)
+    # 结束时关闭浏览器并停止 Playwright：它的 Node 驱动进程继承了 stderr，只有停止后才会退出
+    try:
+        dom = await get_dom_with_content_type(content_type="all_fields")
+        dom_text = str(dom)
+        if os.environ.get("DLAGENT_DUMP_DOM"):
+            # 直接写字节，绕过文本 IO 层；默认只打印长度
+            sys.stdout.flush()
+            sys.stdout.buffer.write(dom_text.encode("utf-8", "replace"))
+            sys.stdout.buffer.write(b"\n")
+            sys.stdout.flush()
+        else:
+            log.info("[DEBUG] Got current DOM (length: %s)", len(dom_text), extra={"color": CYAN})
+
+        # 获取当前页面对象
+        page: Page = await playwright_manager.get_current_page()
+        screenshot,img_path= await get_screenshot()
+        log.info("screenshot: <%s bytes> %s", len(screenshot), img_path)
+        # await highlight_interactive_elements(page)
     
-    if eval_mode:
-        await page.set_extra_http_headers({"User-Agent": "AgentQ-Bot"})
+        if eval_mode:
+            await page.set_extra_http_headers({"User-Agent": "AgentQ-Bot"})
 
-    print(f"{GREEN}Browser started and ready{RESET}")
+        log.info("Browser started and ready", extra={"color": GREEN})
+    finally:
+        await playwright_manager.stop_playwright()
 
     # # 调用 get_web_element_rect 函数
     # rects, web_eles, web_eles_text = await get_web_element_rect(page, fix_color=True)   
@@ -504,230 +536,288 @@ async def main(objective: str = None, eval_mode: bool = False):
     # return dpo_pairs
 
 
-# Temp class to write output to a file
-class StreamToFile:
-    def __init__(self, filename):
-        self.file = open(filename, "w", buffering=1)
-
-    def write(self, data):
-        self.file.write(data)
-        self.file.flush()
-
-    def flush(self):
-        self.file.flush()
-
-    def close(self):
-        self.file.close()
-async def get_web_element_rect(page, fix_color=True):
-    # 定义 borderColor 变量
-    borderColor = 'red'  # 默认边框颜色
+# markPage 只编译一次：作为 init script 安装到 window.__markPage，之后每次调用只传颜色参数
+MARK_PAGE_JS = """
+(() => {
+    // Function to generate random colors
+    function getRandomColor(index) {
+        var letters = '0123456789ABCDEF';
+        var color = '#';
+        for (var i = 0; i < 6; i++) {
+        color += letters[Math.floor(Math.random() * 16)];
+        }
+        return color;
+    }
+
+    function getFixedColor(index) {
+        var color = '#000000'
+        return color
+    }
+    //function getFixedColor(index){
+    //    var colors = ['#FF0000', '#00FF00', '#0000FF', '#000000']; // Red, Green, Blue, Black
+    //    return colors[index % 4];
+    //}
+
+    window.__markPage = function(useFixedColor) {
+        var labels = [];
+        var colorFunction = useFixedColor ? getFixedColor : getRandomColor;
+
+        // Read phase: the viewport size is read once, and the tag / cursor test runs first so that
+        // only candidate elements pay for getClientRects() and the elementFromPoint() hit test
+        var vw = Math.max(document.documentElement.clientWidth || 0, window.innerWidth || 0);
+        var vh = Math.max(document.documentElement.clientHeight || 0, window.innerHeight || 0);
+
+        var items = Array.prototype.slice.call(
+            document.querySelectorAll('*')
+        ).filter(element =>
+            (element.tagName === "INPUT" || element.tagName === "TEXTAREA" || element.tagName === "SELECT") ||
+            (element.tagName === "BUTTON" || element.tagName === "A" || (element.onclick != null) || window.getComputedStyle(element).cursor == "pointer") ||
+            (element.tagName === "IFRAME" || element.tagName === "VIDEO" || element.tagName === "LI" || element.tagName === "TD" || element.tagName === "OPTION")
+        ).map(function(element) {
+            var rects = [...element.getClientRects()].filter(bb => {
+            var center_x = bb.left + bb.width / 2;
+            var center_y = bb.top + bb.height / 2;
+            // elementFromPoint() returns null outside the viewport, skip the hit test there
+            if (center_x < 0 || center_y < 0 || center_x > vw || center_y > vh) {
+                return false;
+            }
+            var elAtCenter = document.elementFromPoint(center_x, center_y);
+
+            return elAtCenter === element || element.contains(elAtCenter) 
+            }).map(bb => {
+            const rect = {
+                left: Math.max(0, bb.left),
+                top: Math.max(0, bb.top),
+                right: Math.min(vw, bb.right),
+                bottom: Math.min(vh, bb.bottom)
+            };
+            return {
+                ...rect,
+                width: rect.right - rect.left,
+                height: rect.bottom - rect.top
+            }
+            });
+
+            var area = rects.reduce((acc, rect) => acc + rect.width * rect.height, 0);
+
+            return {element, area, rects};
+        }).filter(item =>
+            item.area >= 20
+        ).map(item => ({
+            ...item,
+            text: item.element.textContent.trim().replace(/\\s{2,}/g, ' '),
+            tagName: item.element.tagName,
+            type: item.element.getAttribute("type") || '',
+            ariaLabel: item.element.getAttribute("aria-label") || ''
+        }));
+
+        // Only keep inner clickable items
+        // All passes walk up the ancestors of each item with a Set of kept elements,
+        // instead of comparing every pair of items with contains()
+        function keptSet() {
+            return new Set(items.map(item => item.element));
+        }
 
-    if fix_color:
-        borderColor = 'blue'  # 如果 fix_color 为 True，则设置边框颜色为蓝色
-        selected_function = "getFixedColor"
-    else:
-        selected_function = "getRandomColor"
-
-    js_script = """
-    let labels = [];
-
-        function markPage() {
-            var bodyRect = document.body.getBoundingClientRect();
-
-            var items = Array.prototype.slice.call(
-                document.querySelectorAll('*')
-            ).map(function(element) {
-                var vw = Math.max(document.documentElement.clientWidth || 0, window.innerWidth || 0);
-                var vh = Math.max(document.documentElement.clientHeight || 0, window.innerHeight || 0);
-                
-                var rects = [...element.getClientRects()].filter(bb => {
-                var center_x = bb.left + bb.width / 2;
-                var center_y = bb.top + bb.height / 2;
-                var elAtCenter = document.elementFromPoint(center_x, center_y);
-
-                return elAtCenter === element || element.contains(elAtCenter) 
-                }).map(bb => {
-                const rect = {
-                    left: Math.max(0, bb.left),
-                    top: Math.max(0, bb.top),
-                    right: Math.min(vw, bb.right),
-                    bottom: Math.min(vh, bb.bottom)
-                };
-                return {
-                    ...rect,
-                    width: rect.right - rect.left,
-                    height: rect.bottom - rect.top
-                }
-                });
-
-                var area = rects.reduce((acc, rect) => acc + rect.width * rect.height, 0);
-
-                return {
-                element: element,
-                include: 
-                    (element.tagName === "INPUT" || element.tagName === "TEXTAREA" || element.tagName === "SELECT") ||
-                    (element.tagName === "BUTTON" || element.tagName === "A" || (element.onclick != null) || window.getComputedStyle(element).cursor == "pointer") ||
-                    (element.tagName === "IFRAME" || element.tagName === "VIDEO" || element.tagName === "LI" || element.tagName === "TD" || element.tagName === "OPTION")
-                ,
-                area,
-                rects,
-                text: element.textContent.trim().replace(/\s{2,}/g, ' '),
-                tagName: element.tagName,
-                type: element.getAttribute("type") || '',
-                ariaLabel: element.getAttribute("aria-label") || ''
-                };
-            }).filter(item =>
-                item.include && (item.area >= 20)
-            );
-
-            // Only keep inner clickable items
-            // first delete button inner clickable items
-            const buttons = Array.from(document.querySelectorAll('button, a, input[type="button"], div[role="button"]'));
-
-            //items = items.filter(x => !buttons.some(y => y.contains(x.element) && !(x.element === y) ));
-            items = items.filter(x => !buttons.some(y => items.some(z => z.element === y) && y.contains(x.element) && !(x.element === y) ));
-            items = items.filter(x => 
-                !(x.element.parentNode && 
-                x.element.parentNode.tagName === 'SPAN' && 
-                x.element.parentNode.children.length === 1 && 
-                x.element.parentNode.getAttribute('role') &&
-                items.some(y => y.element === x.element.parentNode)));
-
-            items = items.filter(x => !items.some(y => x.element.contains(y.element) && !(x == y)))
-
-            // Function to generate random colors
-            function getRandomColor(index) {
-                var letters = '0123456789ABCDEF';
-                var color = '#';
-                for (var i = 0; i < 6; i++) {
-                color += letters[Math.floor(Math.random() * 16)];
+        // first delete button inner clickable items
+        const buttonSelector = 'button, a, input[type="button"], div[role="button"]';
+        var kept = keptSet();
+        items = items.filter(x => {
+            for (var node = x.element.parentNode; node; node = node.parentNode) {
+                if (node.nodeType === Node.ELEMENT_NODE && kept.has(node) && node.matches(buttonSelector)) {
+                    return false;
                 }
-                return color;
             }
-
-            function getFixedColor(index) {
-                var color = '#000000'
-                return color
+            return true;
+        });
+
+        kept = keptSet();
+        items = items.filter(x => 
+            !(x.element.parentNode && 
+            x.element.parentNode.tagName === 'SPAN' && 
+            x.element.parentNode.children.length === 1 && 
+            x.element.parentNode.getAttribute('role') &&
+            kept.has(x.element.parentNode)));
+
+        // drop items that contain another kept item
+        var hasKeptDescendant = new Set();
+        items.forEach(item => {
+            for (var node = item.element.parentNode; node && !hasKeptDescendant.has(node); node = node.parentNode) {
+                hasKeptDescendant.add(node);
             }
-            //function getFixedColor(index){
-            //    var colors = ['#FF0000', '#00FF00', '#0000FF', '#000000']; // Red, Green, Blue, Black
-            //    return colors[index % 4];
-            //}
+        });
+        items = items.filter(x => !hasKeptDescendant.has(x.element))
+
+        // Write phase: lets create a floating border on top of these elements that will always be visible,
+        // the boxes are built off-document and appended to the body at once
+        var overlay = document.createDocumentFragment();
+        items.forEach(function(item, index) {
+            item.rects.forEach((bbox) => {
+            var newElement = document.createElement("div");
+            var borderColor = colorFunction(index);
+            newElement.style.outline = `2px dashed ${borderColor}`;
+            newElement.style.position = "fixed";
+            newElement.style.left = bbox.left + "px";
+            newElement.style.top = bbox.top + "px";
+            newElement.style.width = bbox.width + "px";
+            newElement.style.height = bbox.height + "px";
+            newElement.style.pointerEvents = "none";
+            newElement.style.boxSizing = "border-box";
+            newElement.style.zIndex = 2147483647;
+            // newElement.style.background = `${borderColor}80`;
+            
+            // Add floating label at the corner
+            var label = document.createElement("span");
+            label.textContent = index;
+            label.style.position = "absolute";
+            //label.style.top = "-19px";
+            label.style.top = Math.max(-19, -bbox.top) + "px";
+            //label.style.left = "0px";
+            label.style.left = Math.min(Math.floor(bbox.width / 5), 2) + "px";
+            label.style.background = borderColor;
+            label.style.color = "white";
+            label.style.padding = "2px 4px";
+            label.style.fontSize = "12px";
+            label.style.borderRadius = "2px";
+            newElement.appendChild(label);
             
+            overlay.appendChild(newElement);
+            labels.push(newElement);
+            // item.element.setAttribute("-ai-label", label.textContent);
+            });
+        })
+        document.body.appendChild(overlay);
+
+        // For the first way
+        // return [labels, items.map(item => ({
+        //     rect: item.rects[0] // assuming there's at least one rect
+        // }))];
+
+        // For the second way
+        return [labels, items]
+    };
+})();
+"""
+
+# 已经通过 add_init_script 安装过 markPage 的页面
+_mark_page_installed: "weakref.WeakSet[Page]" = weakref.WeakSet()
+
+
+async def __ensure_mark_page(page: Page) -> None:
+    # 之后打开的文档由 init script 自动安装，当前文档需要手动执行一次
+    if page not in _mark_page_installed:
+        await page.add_init_script(MARK_PAGE_JS)
+        _mark_page_installed.add(page)
+    await page.evaluate(MARK_PAGE_JS)
+
+
+_INPUT_ATTR_TYPES = frozenset(['text', 'search', 'password', 'email', 'tel'])
+_BUTTON_ATTR_TYPES = frozenset(['submit', 'button'])
+
+
+def _fmt(web_ele_id: int, element_info: dict) -> Optional[str]:
+    # 把 markPage 返回的一个元素格式化成一行文本，不需要展示的元素返回 None
+    ele_tag_name = element_info['tagName']
+    ele_type = element_info['type']
+    ele_aria_label = element_info['ariaLabel']
+    label_text = element_info['text']
+
+    if not label_text:
+        tag = ele_tag_name.lower()
+        if (tag == 'input' and ele_type in _INPUT_ATTR_TYPES) or \
+        tag == 'textarea' or \
+        (tag == 'button' and ele_type in _BUTTON_ATTR_TYPES):
+            return f"[{web_ele_id}]: <{ele_tag_name}> \"{ele_aria_label or label_text}\";"
+        return None
+    if len(label_text) >= 200 or ("<img" in label_text and "src=" in label_text):
+        return None
+    if ele_tag_name in ["button", "input", "textarea"]:
+        if ele_aria_label and (ele_aria_label != label_text):
+            return f"[{web_ele_id}]: <{ele_tag_name}> \"{label_text}\", \"{ele_aria_label}\";"
+        return f"[{web_ele_id}]: <{ele_tag_name}> \"{label_text}\";"
+    if ele_aria_label and (ele_aria_label != label_text):
+        return f"[{web_ele_id}]: \"{label_text}\", \"{ele_aria_label}\";"
+    return f"[{web_ele_id}]: \"{label_text}\";"
 
-            // Lets create a floating border on top of these elements that will always be visible
-            items.forEach(function(item, index) {
-                item.rects.forEach((bbox) => {
-                newElement = document.createElement("div");
-                var borderColor = COLOR_FUNCTION(index);
-                newElement.style.outline = `2px dashed ${borderColor}`;
-                newElement.style.position = "fixed";
-                newElement.style.left = bbox.left + "px";
-                newElement.style.top = bbox.top + "px";
-                newElement.style.width = bbox.width + "px";
-                newElement.style.height = bbox.height + "px";
-                newElement.style.pointerEvents = "none";
-                newElement.style.boxSizing = "border-box";
-                newElement.style.zIndex = 2147483647;
-                // newElement.style.background = `${borderColor}80`;
-                
-                // Add floating label at the corner
-                var label = document.createElement("span");
-                label.textContent = index;
-                label.style.position = "absolute";
-                //label.style.top = "-19px";
-                label.style.top = Math.max(-19, -bbox.top) + "px";
-                //label.style.left = "0px";
-                label.style.left = Math.min(Math.floor(bbox.width / 5), 2) + "px";
-                label.style.background = borderColor;
-                label.style.color = "white";
-                label.style.padding = "2px 4px";
-                label.style.fontSize = "12px";
-                label.style.borderRadius = "2px";
-                newElement.appendChild(label);
-                
-                document.body.appendChild(newElement);
-                labels.push(newElement);
-                // item.element.setAttribute("-ai-label", label.textContent);
-                });
-            })
-
-            // For the first way
-            // return [labels, items.map(item => ({
-            //     rect: item.rects[0] // assuming there's at least one rect
-            // }))];
-
-            // For the second way
-            return [labels, items]
-        }
 
-    // Call the markPage function and return its result
-    markPage();
-    """.replace("COLOR_FUNCTION", selected_function)
-
-    # 获取 web 元素的矩形和其他属性  
-    rects, items_raw = await page.evaluate(js_script)  
-
-    format_ele_text = []  
-    for web_ele_id in range(len(items_raw)):  
-
-        element_info = items_raw[web_ele_id]
-        ele_tag_name = element_info['tagName']
-        ele_type = element_info['type']
-        ele_aria_label = element_info['ariaLabel']
-        # print(f"tagname:{ele_tag_name}")
-        # print(f"type:{ele_type}")
-        # print(f"ariaLabel:{ele_aria_label}")
-
-        # 安全地访问 tag_name  
-        # ele_tag_name = items_raw[web_ele_id]['element'].tag_name  
-        # ele_type = items_raw[web_ele_id]['element'].get_attribute("type")  
-        # ele_aria_label = items_raw[web_ele_id]['element'].get_attribute("aria-label")  
-        label_text = items_raw[web_ele_id]['text']  
-        input_attr_types = ['text', 'search', 'password', 'email', 'tel']  
-        
-        if not label_text:  
-            if (ele_tag_name.lower() == 'input' and ele_type in input_attr_types) or \
-            ele_tag_name.lower() == 'textarea' or \
-            (ele_tag_name.lower() == 'button' and ele_type in ['submit', 'button']):  
-                if ele_aria_label:  
-                    format_ele_text.append(f"[{web_ele_id}]: <{ele_tag_name}> \"{ele_aria_label}\";")  
-                else:  
-                    format_ele_text.append(f"[{web_ele_id}]: <{ele_tag_name}> \"{label_text}\";")  
-        elif label_text and len(label_text) < 200:  
-            if not ("<img" in label_text and "src=" in label_text):  
-                if ele_tag_name in ["button", "input", "textarea"]:  
-                    if ele_aria_label and (ele_aria_label != label_text):  
-                        format_ele_text.append(f"[{web_ele_id}]: <{ele_tag_name}> \"{label_text}\", \"{ele_aria_label}\";")  
-                    else:  
-                        format_ele_text.append(f"[{web_ele_id}]: <{ele_tag_name}> \"{label_text}\";")  
-                else:  
-                    if ele_aria_label and (ele_aria_label != label_text):  
-                        format_ele_text.append(f"[{web_ele_id}]: \"{label_text}\", \"{ele_aria_label}\";")  
-                    else:  
-                        format_ele_text.append(f"[{web_ele_id}]: \"{label_text}\";")  
-
-    format_ele_text = '\t'.join(format_ele_text)  
+async def get_web_element_rect(page, fix_color=True):
+    # 获取 web 元素的矩形和其他属性，markPage 未安装时（旧文档）先安装再调用
+    result = await page.evaluate(
+        "(c) => window.__markPage ? window.__markPage(c) : null", fix_color
+    )
+    if result is None:
+        await __ensure_mark_page(page)
+        result = await page.evaluate("(c) => window.__markPage(c)", fix_color)
+    rects, items_raw = result
+
+    format_ele_text = '\t'.join(
+        line for line in (_fmt(web_ele_id, element_info) for web_ele_id, element_info in enumerate(items_raw)) if line
+    )
     return rects, [web_ele['element'] for web_ele in items_raw], format_ele_text
 
 
+def restore_output(tee, saved_stdout, saved_stderr):
+    # 退出时先刷出缓冲，再把 fd 1/2 换回原来的终端；管道的写端全部关闭后 tee 读到 EOF，写完文件退出
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(saved_stdout, sys.__stdout__.fileno())
+    os.dup2(saved_stderr, sys.__stderr__.fileno())
+    os.close(saved_stdout)
+    os.close(saved_stderr)
+    # 仍持有管道写端的子进程会让 tee 一直等不到 EOF，等待超时后直接结束 tee
+    try:
+        tee.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        tee.terminate()
+        tee.wait()
+
+
 if __name__ == "__main__":
-    print(f"{BLUE}[DEBUG] Script started{RESET}")
-    output_stream = StreamToFile("output.txt")
-    # sys.stdout = output_stream
-    # sys.stderr = output_stream
+    # 日志同时写入 output.txt（64KB 缓冲，不带颜色）和终端（仅在 TTY 上带颜色）
+    console_handler = logging.StreamHandler(sys.__stdout__)
+    console_handler.setFormatter(ColorFormatter(use_color=sys.__stdout__.isatty()))
+    handlers = [console_handler]
+    output_file = None
+    if os.environ.get("DLAGENT_TEE_OUTPUT") and shutil.which("tee"):
+        # 把 fd 1/2 重定向到 tee 进程，由它同时写终端和 output.txt；
+        # print、子进程和 C 扩展的输出都会进入文件，Python 侧不再逐条写文件
+        sys.__stdout__.flush()
+        sys.__stderr__.flush()
+        saved_stdout = os.dup(sys.__stdout__.fileno())
+        saved_stderr = os.dup(sys.__stderr__.fileno())
+        tee = subprocess.Popen(["tee", "output.txt"], stdin=subprocess.PIPE)
+        os.dup2(tee.stdin.fileno(), sys.__stdout__.fileno())
+        os.dup2(tee.stdin.fileno(), sys.__stderr__.fileno())
+        tee.stdin.close()
+        atexit.register(restore_output, tee, saved_stdout, saved_stderr)
+        # 终端输出同时经 tee 写进文件，为了让 output.txt 不带 ANSI 码，这里不上色
+        console_handler.setFormatter(ColorFormatter(use_color=False))
+    else:
+        output_file = open("output.txt", "w", buffering=1 << 16, encoding="utf-8")
+        file_handler = logging.StreamHandler(output_file)
+        file_handler.setFormatter(ColorFormatter(use_color=False))
+        handlers.append(file_handler)
+    logging.basicConfig(level=logging.INFO, handlers=handlers)
+
+    log.info("[DEBUG] Script started", extra={"color": BLUE})
     try:
+        # uvloop 是可选依赖（Windows 上不可用），没有安装时使用默认事件循环
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            uvloop.install()
         asyncio.run(
             main(
                 objective="Find a family-friendly hotel in NYC with a rating of 4 stars or higher on https://www.nyc.com",
                 eval_mode=False,
             )
         )
+        log.info("[DEBUG] Script finished", extra={"color": GREEN})
     finally:
-        sys.stdout = sys.__stdout__
-        sys.stderr = sys.__stderr__
-        output_stream.close()
-    print(f"{GREEN}[DEBUG] Script finished{RESET}")
+        logging.shutdown()
+        if output_file is not None:
+            output_file.close()
 
 
 # # 示例运行
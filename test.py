@@ -1,25 +1,36 @@
-from playwright.sync_api import Playwright, sync_playwright, expect
+from typing import Optional
+
+from playwright.sync_api import Browser, Playwright, sync_playwright, expect
 import json
 
-def run(playwright: Playwright) -> None:
-    browser = playwright.chromium.launch(executable_path=r'C:\Program Files\Google\Chrome\Application\chrome.exe', headless=False)
-    context = browser.new_context()
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson 是可选依赖
+    json_loads = json.loads
+
+SAME_SITE_VALUES = {'strict': 'Strict', 'lax': 'Lax', 'none': 'None'}
+
+def run(playwright: Playwright, browser: Optional[Browser] = None) -> None:
+    # 传入已启动的浏览器时直接复用，只新建上下文，省去每次启动浏览器的开销
+    owns_browser = browser is None
+    if owns_browser:
+        browser = playwright.chromium.launch(executable_path=r'C:\Program Files\Google\Chrome\Application\chrome.exe', headless=False)
     storage_state = "data_webvoyager_training/IL_1/www.ryanair.com.json"
     
-    # 读取并添加 cookies
-    with open(storage_state, 'r') as f:
-        cookies = json.load(f)
+    # 读取 cookies
+    with open(storage_state, 'rb') as f:
+        cookies = json_loads(f.read())
         if not isinstance(cookies, list):
             raise ValueError("Cookies should be a list of cookie objects")
-        
-        # 确保 sameSite 属性的值是正确的
-        for cookie in cookies:
-            if 'sameSite' not in cookie or cookie['sameSite'].lower() not in ['strict', 'lax', 'none']:
-                cookie['sameSite'] = 'Lax'  # 设置默认值为 'Lax'
-            else:
-                cookie['sameSite'] = cookie['sameSite'].capitalize()
-        
-        context.add_cookies(cookies)
+    
+    # 确保 sameSite 属性的值是正确的，无效或缺失时默认为 'Lax'
+    cookies = [
+        {**cookie, 'sameSite': SAME_SITE_VALUES.get(str(cookie.get('sameSite', '')).lower(), 'Lax')}
+        for cookie in cookies
+    ]
+    
+    # 创建上下文时直接作为 storage_state 载入 cookies，不再单独调用 add_cookies
+    context = browser.new_context(storage_state={"cookies": cookies, "origins": []})
     
     page = context.new_page()
     page.goto('https://www.ryanair.com')
@@ -42,7 +53,9 @@ def run(playwright: Playwright) -> None:
 
 
     context.close()
-    browser.close()
+    # 复用的浏览器由调用方负责关闭
+    if owns_browser:
+        browser.close()
 
 with sync_playwright() as playwright:
     run(playwright)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import asyncio
+
+from agentq.utils.get_detailed_accessibility_tree import (
+    __cdp_accessibility_snapshot,
+    __prune_tree,
+)
+
+
+class FakeCDPSession:
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    async def send(self, method):
+        assert method == "Accessibility.getFullAXTree"
+        return {"nodes": self.nodes}
+
+
+class FakeContext:
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.sessions_opened = 0
+
+    async def new_cdp_session(self, page):
+        self.sessions_opened += 1
+        return FakeCDPSession(self.nodes)
+
+
+class FakePage:
+    def __init__(self, nodes):
+        self.context = FakeContext(nodes)
+
+
+# A document with a text field and a static text wrapped in an ignored node
+NODES = [
+    {
+        "nodeId": "1",
+        "role": {"value": "RootWebArea"},
+        "name": {"value": "Login"},
+        "childIds": ["2", "3"],
+    },
+    {
+        "nodeId": "2",
+        "ignored": True,
+        "ignoredReasons": [{"name": "uninteresting", "value": {"value": True}}],
+        "role": {"value": "none"},
+        "childIds": ["4"],
+    },
+    {
+        "nodeId": "3",
+        "role": {"value": "textbox"},
+        "name": {"value": "Username"},
+        "properties": [{"name": "focused", "value": {"value": True}}],
+    },
+    {"nodeId": "4", "role": {"value": "StaticText"}, "name": {"value": "Forgot password?"}},
+]
+
+# What page.accessibility.snapshot(interesting_only=False) returns for the same document
+PLAYWRIGHT_SNAPSHOT = {
+    "role": "WebArea",
+    "name": "Login",
+    "children": [
+        {
+            "role": "none",
+            "name": "",
+            "children": [{"role": "text", "name": "Forgot password?"}],
+        },
+        {"role": "textbox", "name": "Username", "focused": True},
+    ],
+}
+
+
+def test_cdp_snapshot_matches_playwright_snapshot():
+    tree = asyncio.run(__cdp_accessibility_snapshot(FakePage(NODES)))
+
+    assert tree == PLAYWRIGHT_SNAPSHOT
+
+
+def test_cdp_snapshot_reuses_the_page_session():
+    page = FakePage(NODES)
+
+    asyncio.run(__cdp_accessibility_snapshot(page))
+    asyncio.run(__cdp_accessibility_snapshot(page))
+
+    assert page.context.sessions_opened == 1
+
+
+def test_cdp_snapshot_root_survives_input_field_pruning():
+    tree = asyncio.run(__cdp_accessibility_snapshot(FakePage(NODES)))
+    tree["children"][1]["tag"] = "input"
+
+    pruned = __prune_tree(tree, only_input_fields=True)
+
+    assert pruned is not None
+    assert pruned["role"] == "WebArea"
+    assert pruned["children"] == [
+        {"role": "textbox", "name": "Username", "focused": True, "tag": "input"}
+    ]
@@ -1,53 +1,385 @@
+import base64
+import functools
+import glob
+import hashlib
+import importlib.util
 import json
+import mimetypes
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import torch
+from torch.utils.data import DataLoader, Dataset
 from qwen_vl_utils import process_vision_info
-from transformers import AutoProcessor, Qwen2VLForConditionalGeneration
+from transformers import (
+    AutoProcessor,
+    BitsAndBytesConfig,
+    Qwen2VLForConditionalGeneration,
+    TextIteratorStreamer,
+)
 
 from agentq.core.models.models import (
     AgentQActorInput,
 )
 from agentq.core.prompts.prompts import LLM_PROMPTS
 
-# Default: Load the model on the available device(s)
-model = Qwen2VLForConditionalGeneration.from_pretrained(
-    "Qwen/Qwen2-VL-7B-Instruct",
-    torch_dtype="auto",
-    device_map="auto",
-)
-
-processor = AutoProcessor.from_pretrained("Qwen/Qwen2-VL-7B-Instruct")
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson 是可选依赖
+    json_loads = json.loads
 
-# 读取 JSON 文件中的 messages
-file_path = "result/Apple--33/maxReward_output.json"
-with open(file_path, "r") as file:
-    data = json.load(file)
-    messages = data["conversations"]
+MODEL_NAME = "Qwen/Qwen2-VL-7B-Instruct"
 
-# 打印读取的 messages
-print(messages)
+# 设置 DLAGENT_INFERENCE_URL（如 http://localhost:8000/v1）时把对话发给常驻的 OpenAI 兼容推理服务，
+# 本进程不加载模型，例如预先启动：
+#   python -m vllm.entrypoints.openai.api_server --model Qwen/Qwen2-VL-7B-Instruct --dtype bfloat16
+INFERENCE_URL = os.environ.get("DLAGENT_INFERENCE_URL")
 
-# Preparation for inference
-text = processor.apply_chat_template(
-    messages, tokenize=False, add_generation_prompt=True
+# 设置 DLAGENT_USE_VLLM 且装了 vllm 时用 vLLM 推理：分页 KV cache 和连续批处理由 vLLM 的调度器负责
+USE_VLLM = bool(os.environ.get("DLAGENT_USE_VLLM")) and bool(
+    importlib.util.find_spec("vllm")
 )
-image_inputs, video_inputs = process_vision_info(messages)
-inputs = processor(
-    text=[text],
-    images=image_inputs,
-    videos=video_inputs,
-    padding=True,
-    return_tensors="pt",
+# 设置 DLAGENT_TORCH_COMPILE 时编译 forward 并使用静态 KV cache，解码步骤可以复用同一个 CUDA graph
+TORCH_COMPILE = bool(os.environ.get("DLAGENT_TORCH_COMPILE"))
+# 设置 DLAGENT_LOAD_IN_4BIT 且装了 bitsandbytes 时以 4-bit NF4 加载权重，解码时读取的权重约为 bfloat16 的四分之一
+LOAD_IN_4BIT = bool(os.environ.get("DLAGENT_LOAD_IN_4BIT")) and bool(
+    importlib.util.find_spec("bitsandbytes")
 )
-inputs = inputs.to("cuda")
+# 设置 DLAGENT_DRAFT_MODEL（如 Qwen/Qwen2-VL-2B-Instruct，须与主模型共用 tokenizer）时投机解码：
+# 小模型每步起草 5 个 token，大模型一次前向验证，解码时大模型权重的读取次数随之减少
+DRAFT_MODEL = os.environ.get("DLAGENT_DRAFT_MODEL")
 
 # Inference: Generation of the output
-generated_ids = model.generate(**inputs, max_new_tokens=1000000)
+# 使用 KV cache 贪心解码，并限制生成长度；inference_mode 下不记录梯度
+MAX_NEW_TOKENS = 1024
+BATCH_SIZE = int(os.environ.get("DLAGENT_BATCH_SIZE", "8"))
+NUM_WORKERS = min(4, os.cpu_count() or 1)
 
-generated_ids_trimmed = [
-    out_ids[len(in_ids) :] for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
-]
+# 同一段对话渲染出的 prompt 不会变，按模型名和 messages 的哈希缓存到磁盘，重复运行时跳过模板渲染
+TEMPLATE_CACHE_DIR = ".cache/tpl"
 
-output_text = processor.batch_decode(
-    generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
-)
-print(output_text)
+# 预处理的 worker 进程一律用 spawn 启动：子进程只导入本模块，模型都在 main() 里加载，
+# 既不会重复加载模型，也不会 fork 出一个已经持有 CUDA 上下文的进程
+WORKER_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def load_model():
+    quantization_kwargs = {}
+    if LOAD_IN_4BIT:
+        quantization_kwargs["quantization_config"] = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_compute_dtype=torch.bfloat16,
+            bnb_4bit_quant_type="nf4",
+        )
+
+    # Default: Load the model on the available device(s)
+    # bfloat16 权重；装了 flash-attn 时使用 FlashAttention-2，否则退回 PyTorch 的 sdpa
+    attn_implementation = (
+        "flash_attention_2" if importlib.util.find_spec("flash_attn") else "sdpa"
+    )
+    model = Qwen2VLForConditionalGeneration.from_pretrained(
+        MODEL_NAME,
+        torch_dtype=torch.bfloat16,
+        device_map="auto",
+        attn_implementation=attn_implementation,
+        **quantization_kwargs,
+    )
+    model.eval()
+
+    if TORCH_COMPILE:
+        model.forward = torch.compile(model.forward, mode="reduce-overhead")
+
+    draft_model = None
+    if DRAFT_MODEL:
+        draft_model = Qwen2VLForConditionalGeneration.from_pretrained(
+            DRAFT_MODEL,
+            torch_dtype=torch.bfloat16,
+            device_map="auto",
+            attn_implementation=attn_implementation,
+        )
+        draft_model.eval()
+        draft_model.generation_config.num_assistant_tokens = 5
+    return model, draft_model
+
+
+@functools.lru_cache(maxsize=1)
+def get_processor():
+    # processor（tokenizer 和图片预处理配置）只加载一次，之后都复用同一个实例
+    processor = AutoProcessor.from_pretrained(MODEL_NAME)
+    # 左侧 padding，批量生成时每一行的新 token 都紧跟在各自的 prompt 后面
+    processor.tokenizer.padding_side = "left"
+    return processor
+
+
+@functools.lru_cache(maxsize=1)
+def get_eos_token_ids():
+    # 回复以 <|im_end|> 结束，遇到它或 tokenizer 的 eos 即停止生成，不必跑满 MAX_NEW_TOKENS
+    tokenizer = get_processor().tokenizer
+    return sorted(
+        {tokenizer.convert_tokens_to_ids("<|im_end|>"), tokenizer.eos_token_id} - {None}
+    )
+
+
+def load_conversations():
+    # 读取所有结果目录下 JSON 文件中的 messages，一次批量推理
+    file_paths = sorted(glob.glob("result/*/maxReward_output.json"))
+    conversations = []
+    for file_path in file_paths:
+        with open(file_path, "rb") as file:
+            data = json_loads(file.read())
+            conversations.append(data["conversations"])
+    return file_paths, conversations
+
+
+def apply_chat_template_cached(messages):
+    return render_chat_template(json.dumps([MODEL_NAME, messages], sort_keys=True))
+
+
+# 进程内再按序列化后的 messages 缓存一层，同一进程里重复的对话既不渲染也不读文件
+@functools.lru_cache(maxsize=1024)
+def render_chat_template(key_json):
+    key = hashlib.md5(key_json.encode("utf-8")).hexdigest()
+    cache_path = os.path.join(TEMPLATE_CACHE_DIR, f"{key}.txt")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+    _, messages = json.loads(key_json)
+    text = get_processor().apply_chat_template(
+        messages, tokenize=False, add_generation_prompt=True
+    )
+    os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return text
+
+
+# Preparation for inference
+def prepare(messages):
+    # 模板渲染和图片读取，在 worker 进程里执行
+    text = apply_chat_template_cached(messages)
+    image_inputs, video_inputs = process_vision_info(messages)
+    return text, image_inputs, video_inputs
+
+
+class ConversationDataset(Dataset):
+    def __init__(self, conversations):
+        self.conversations = conversations
+
+    def __len__(self):
+        return len(self.conversations)
+
+    def __getitem__(self, index):
+        return prepare(self.conversations[index])
+
+
+def collate(samples):
+    # 一个批次的文本和图片一起交给 processor，得到左侧 padding 的张量；
+    # 批次内所有截图的 patch 拼接在同一个 pixel_values 里，image_grid_thw 按顺序记录每张图的网格，
+    # 预填充时视觉编码器对整个批次只做一次前向
+    image_inputs = [image for _, images, _ in samples for image in images or []]
+    video_inputs = [video for _, _, videos in samples for video in videos or []]
+    return dict(
+        get_processor()(
+            text=[text for text, _, _ in samples],
+            images=image_inputs or None,
+            videos=video_inputs or None,
+            padding=True,
+            return_tensors="pt",
+        )
+    )
+
+
+def generate(model, inputs, draft_model=None, **kwargs):
+    # 投机解码只支持单条输入，多条对话的批次仍按普通方式生成
+    if draft_model is not None and inputs["input_ids"].shape[0] == 1:
+        kwargs["assistant_model"] = draft_model
+    # inference_mode 只对当前线程生效，所以在执行 generate 的线程里进入
+    with torch.inference_mode():
+        return model.generate(
+            **inputs,
+            max_new_tokens=MAX_NEW_TOKENS,
+            use_cache=True,
+            do_sample=False,
+            eos_token_id=get_eos_token_ids(),
+            pad_token_id=get_processor().tokenizer.pad_token_id,
+            **({"cache_implementation": "static"} if TORCH_COMPILE else {}),
+            **kwargs,
+        )
+
+
+def generate_to_streamer(model, inputs, draft_model, streamer, errors):
+    # 在后台线程里运行；generate 出错时也要结束 streamer，否则主线程会一直等待下一段输出
+    try:
+        generate(model, inputs, draft_model, streamer=streamer)
+    except BaseException as error:
+        errors.append(error)
+        streamer.end()
+
+
+def prefetch_to_cuda(loader):
+    # 锁页内存中的批次在单独的 stream 上异步拷贝到显存：下一批的拷贝在当前批次生成之前发出，
+    # 两者重叠；使用某一批之前，默认 stream 只等待这一批自己的拷贝事件
+    copy_stream = torch.cuda.Stream()
+    pending = None
+    for batch in loader:
+        with torch.cuda.stream(copy_stream):
+            inputs = {key: value.to("cuda", non_blocking=True) for key, value in batch.items()}
+            copied = torch.cuda.Event()
+            copied.record()
+        if pending is not None:
+            yield ready_on_current_stream(*pending)
+        pending = (inputs, copied)
+    if pending is not None:
+        yield ready_on_current_stream(*pending)
+
+
+def ready_on_current_stream(inputs, copied):
+    stream = torch.cuda.current_stream()
+    stream.wait_event(copied)
+    for value in inputs.values():
+        # 张量在拷贝 stream 上分配，告诉缓存分配器它也被默认 stream 使用
+        value.record_stream(stream)
+    return inputs
+
+
+def to_openai_content(item):
+    # Qwen 格式的 {"type": "image", "image": 路径} 转成 OpenAI 的 image_url，本地截图以 base64 data URL 发送
+    if not isinstance(item, dict) or item.get("type") != "image":
+        return item
+    image = item["image"]
+    if not image.startswith(("http://", "https://", "data:")):
+        path = image[len("file://") :] if image.startswith("file://") else image
+        mime_type = mimetypes.guess_type(path)[0] or "image/png"
+        with open(path, "rb") as f:
+            image = f"data:{mime_type};base64,{base64.b64encode(f.read()).decode('ascii')}"
+    return {"type": "image_url", "image_url": {"url": image}}
+
+
+def to_openai_messages(messages):
+    return [
+        {
+            **message,
+            "content": (
+                [to_openai_content(item) for item in message["content"]]
+                if isinstance(message["content"], list)
+                else message["content"]
+            ),
+        }
+        for message in messages
+    ]
+
+
+def chat_completion(client, messages):
+    response = client.chat.completions.create(
+        model=MODEL_NAME,
+        messages=to_openai_messages(messages),
+        max_tokens=MAX_NEW_TOKENS,
+        temperature=0,
+    )
+    return response.choices[0].message.content
+
+
+def main():
+    file_paths, conversations = load_conversations()
+
+    # 打印读取的 messages
+    for file_path, messages in zip(file_paths, conversations):
+        print(file_path)
+        print(messages)
+
+    if INFERENCE_URL:
+        from openai import OpenAI
+
+        client = OpenAI(
+            base_url=INFERENCE_URL,
+            api_key=os.environ.get("DLAGENT_INFERENCE_API_KEY", "EMPTY"),
+        )
+        # 请求并发发出，由服务端的连续批处理合并
+        with ThreadPoolExecutor(max_workers=min(16, len(conversations) or 1)) as executor:
+            output_text = list(
+                executor.map(functools.partial(chat_completion, client), conversations)
+            )
+        for file_path, text in zip(file_paths, output_text):
+            print(file_path)
+            print(text)
+    elif USE_VLLM:
+        from vllm import LLM, SamplingParams
+
+        # 提交前的模板渲染和图片读取分给多个进程并行，进程池在创建 vLLM 引擎之前用完
+        with ProcessPoolExecutor(max_workers=NUM_WORKERS, mp_context=WORKER_CONTEXT) as executor:
+            prepared = list(executor.map(prepare, conversations))
+        prompts = []
+        for text, images, videos in prepared:
+            prompt = {"prompt": text}
+            if images:
+                prompt["multi_modal_data"] = {"image": images}
+            prompts.append(prompt)
+
+        # 所有对话一次提交，由 vLLM 自行打包成批
+        llm = LLM(model=MODEL_NAME, dtype="bfloat16", max_model_len=8192)
+        outputs = llm.generate(
+            prompts, SamplingParams(max_tokens=MAX_NEW_TOKENS, temperature=0)
+        )
+        output_text = [output.outputs[0].text for output in outputs]
+        for file_path, text in zip(file_paths, output_text):
+            print(file_path)
+            print(text)
+    else:
+        model, draft_model = load_model()
+        processor = get_processor()
+
+        # worker 进程准备下一批输入（模板、图片解码、processor）时，GPU 在生成当前批次；
+        # 批次放在锁页内存里，可以异步拷贝到显存
+        loader = DataLoader(
+            ConversationDataset(conversations),
+            batch_size=BATCH_SIZE,
+            num_workers=NUM_WORKERS,
+            multiprocessing_context=WORKER_CONTEXT,
+            pin_memory=True,
+            collate_fn=collate,
+        )
+        for batch_index, inputs in enumerate(prefetch_to_cuda(loader)):
+            batch_paths = file_paths[batch_index * BATCH_SIZE : (batch_index + 1) * BATCH_SIZE]
+
+            if len(batch_paths) == 1:
+                # 批次里只有一段对话时边生成边输出：generate 在后台线程运行，主线程同时解码已生成的 token
+                streamer = TextIteratorStreamer(
+                    processor.tokenizer,
+                    skip_prompt=True,
+                    skip_special_tokens=True,
+                    clean_up_tokenization_spaces=False,
+                )
+                errors = []
+                thread = threading.Thread(
+                    target=generate_to_streamer,
+                    args=(model, inputs, draft_model, streamer, errors),
+                )
+                thread.start()
+                print(batch_paths[0])
+                for chunk in streamer:
+                    print(chunk, end="", flush=True)
+                thread.join()
+                print()
+                if errors:
+                    raise errors[0]
+                continue
+
+            # TextIteratorStreamer 只支持单条输入，多段对话批量生成后一起解码
+            generated_ids = generate(model, inputs, draft_model)
+
+            # 左侧 padding 时所有行的 prompt 等长，一次切片即可去掉 prompt
+            generated_ids_trimmed = generated_ids[:, inputs["input_ids"].shape[1] :]
+
+            output_text = processor.batch_decode(
+                generated_ids_trimmed, skip_special_tokens=True, clean_up_tokenization_spaces=False
+            )
+            for file_path, text in zip(batch_paths, output_text):
+                print(file_path)
+                print(text)
+
+
+if __name__ == "__main__":
+    main()
 # <|object_ref_start|>language switch<|object_ref_end|><|box_start|>(576,12),(592,42)<|box_end|>import json